@@ -1,24 +1,295 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pymongo import MongoClient
+from fastapi.responses import FileResponse, JSONResponse, Response
+from pydantic import BaseModel
+from pymongo import MongoClient, ReplaceOne, ReturnDocument, UpdateOne
 from pymongo.errors import DuplicateKeyError
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
 from bson import ObjectId
 from typing import Optional, List, Dict
-from datetime import datetime
+from datetime import datetime, timezone
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+import anyio
+import asyncio
+import gzip
+import hashlib
+import logging
+import math
 import os
+import re
 import secrets
+import threading
+import time
 from dotenv import load_dotenv
 import json
+import numpy as np
 
 load_dotenv()
 
+logger = logging.getLogger("heritagecraft")
+
 app = FastAPI(
     title="Heritage Atlas API",
     description="Geographical Indication–Based Artisan Commerce Platform",
     version="1.0.0"
 )
 
+# Admission Control
+# Every routed request gets a priority class and a per-route concurrency budget
+# with a bounded wait queue. A global in-flight limit sheds aggregate routes
+# first, and a per-client token bucket absorbs bursts. Rejections are fast
+# 503/429 responses with Retry-After instead of slow timeouts.
+PRIORITY_CRITICAL = 0
+PRIORITY_STANDARD = 1
+PRIORITY_AGGREGATE = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_CRITICAL: "critical",
+    PRIORITY_STANDARD: "standard",
+    PRIORITY_AGGREGATE: "aggregate",
+}
+
+# Fraction of the global in-flight limit each priority class may use; once
+# in-flight requests pass a class's share, new requests of that class are shed
+# so the remaining headroom is kept for higher priorities.
+PRIORITY_SHARES = {
+    PRIORITY_CRITICAL: 1.0,
+    PRIORITY_STANDARD: 0.85,
+    PRIORITY_AGGREGATE: 0.6,
+}
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_GLOBAL_LIMIT = int(os.getenv("ADMISSION_GLOBAL_LIMIT", "64"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2.0"))
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "20"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "40"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+# Number of trusted reverse proxies in front of the app (1 on Render). Only the
+# X-Forwarded-For entries they appended are trusted; 0 ignores the header.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+
+# (method, path pattern, budget name, priority, max concurrent, max queued, token cost)
+# Patterns are matched in order, so specific paths must precede the
+# /api/products/{product_id} catch-all.
+ADMISSION_ROUTES = [
+    ("GET", r"/api/products/verify", "verify", PRIORITY_CRITICAL, 32, 64, 1),
+    ("GET", r"/api/products/by-region", "products_by_region", PRIORITY_AGGREGATE, 4, 8, 5),
+    ("GET", r"/api/products/by-gi-tag", "products_by_gi_tag", PRIORITY_AGGREGATE, 4, 8, 5),
+    ("GET", r"/api/products/popular", "products_popular", PRIORITY_STANDARD, 16, 32, 1),
+    ("GET", r"/api/products/batch", "product_batch", PRIORITY_STANDARD, 16, 32, 2),
+    ("POST", r"/api/products/batch", "product_batch_post", PRIORITY_STANDARD, 16, 32, 2),
+    ("GET", r"/api/products/[^/]+/related", "product_related", PRIORITY_STANDARD, 16, 32, 1),
+    ("POST", r"/api/products/related/rebuild", "related_rebuild", PRIORITY_AGGREGATE, 1, 0, 10),
+    ("GET", r"/api/products/[^/]+", "product_detail", PRIORITY_CRITICAL, 32, 64, 1),
+    ("GET", r"/api/products", "product_list", PRIORITY_STANDARD, 16, 32, 2),
+    ("POST", r"/api/products", "product_create", PRIORITY_STANDARD, 8, 16, 2),
+    ("PATCH", r"/api/products/[^/]+", "product_update", PRIORITY_STANDARD, 8, 16, 2),
+    ("POST", r"/api/products/[^/]+/deactivate", "product_deactivate", PRIORITY_STANDARD, 8, 16, 2),
+    ("GET", r"/api/artisans", "artisan_list", PRIORITY_STANDARD, 16, 32, 2),
+    ("GET", r"/api/artisans/[^/]+", "artisan_detail", PRIORITY_STANDARD, 16, 32, 1),
+    ("GET", r"/api/regions", "regions", PRIORITY_AGGREGATE, 4, 8, 3),
+    ("GET", r"/api/gi-tags", "gi_tags", PRIORITY_AGGREGATE, 4, 8, 3),
+    ("GET", r"/api/stats", "stats", PRIORITY_AGGREGATE, 2, 4, 5),
+]
+
+
+class RouteBudget:
+    """Concurrency budget for one route with a bounded FIFO wait queue."""
+
+    def __init__(self, name: str, priority: int, max_concurrent: int, max_queue: int, cost: float):
+        self.name = name
+        self.priority = priority
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.cost = cost
+        self.active = 0
+        self.waiters = deque()
+        self.counters = {
+            "admitted": 0,
+            "queued": 0,
+            "shed_queue_full": 0,
+            "shed_queue_timeout": 0,
+            "shed_priority": 0,
+            "rate_limited": 0,
+        }
+
+    async def acquire(self, timeout: float) -> Optional[str]:
+        """Take a slot, waiting in the queue if needed. Returns a shed reason or None."""
+        if self.active < self.max_concurrent and not self.waiters:
+            self.active += 1
+            self.counters["admitted"] += 1
+            return None
+        if len(self.waiters) >= self.max_queue:
+            self.counters["shed_queue_full"] += 1
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.counters["queued"] += 1
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+            elif waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.counters["shed_queue_timeout"] += 1
+            return "queue_timeout"
+        self.counters["admitted"] += 1
+        return None
+
+    def release(self):
+        """Hand the slot to the next live waiter, or free it."""
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict:
+        return {
+            "priority": PRIORITY_NAMES[self.priority],
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": len(self.waiters),
+            **self.counters,
+        }
+
+
+class AdmissionController:
+    """Route classification, global priority shedding and per-client rate limits."""
+
+    def __init__(self, routes, global_limit: int, rate: float, burst: float, max_clients: int):
+        self.routes = [
+            (method, re.compile(pattern), RouteBudget(name, priority, concurrent, queue, cost))
+            for method, pattern, name, priority, concurrent, queue, cost in routes
+        ]
+        self.budgets = {budget.name: budget for _, _, budget in self.routes}
+        self.global_limit = global_limit
+        self.global_active = 0
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        # client -> [tokens, last refill time], least recently seen first
+        self.buckets = OrderedDict()
+
+    def classify(self, method: str, path: str) -> Optional[RouteBudget]:
+        path = path.rstrip("/") or "/"
+        for route_method, pattern, budget in self.routes:
+            if route_method == method and pattern.fullmatch(path):
+                return budget
+        return None
+
+    def over_priority_share(self, priority: int) -> bool:
+        return self.global_active >= self.global_limit * PRIORITY_SHARES[priority]
+
+    def take_tokens(self, client: str, cost: float) -> float:
+        """Charge a client's token bucket. Returns 0 if admitted, else seconds to wait."""
+        now = time.monotonic()
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = [self.burst, now]
+            self.buckets[client] = bucket
+            if len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(client)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0.0
+        return (cost - bucket[0]) / self.rate
+
+    def refund_tokens(self, client: str, cost: float):
+        """Give back tokens charged for a request that was then shed."""
+        bucket = self.buckets.get(client)
+        if bucket is not None:
+            bucket[0] = min(self.burst, bucket[0] + cost)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": ADMISSION_ENABLED,
+            "global_limit": self.global_limit,
+            "global_active": self.global_active,
+            "tracked_clients": len(self.buckets),
+            "routes": {name: budget.stats() for name, budget in self.budgets.items()},
+        }
+
+
+admission = AdmissionController(
+    ADMISSION_ROUTES,
+    global_limit=ADMISSION_GLOBAL_LIMIT,
+    rate=RATE_LIMIT_PER_SECOND,
+    burst=RATE_LIMIT_BURST,
+    max_clients=RATE_LIMIT_MAX_CLIENTS,
+)
+
+
+def client_key(request: Request) -> str:
+    """Identify the caller for rate limiting.
+
+    Callers can prepend anything to X-Forwarded-For, so only the entry added by
+    the outermost trusted proxy (TRUSTED_PROXY_HOPS from the right) is used.
+    """
+    if TRUSTED_PROXY_HOPS > 0:
+        forwarded = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        if len(forwarded) >= TRUSTED_PROXY_HOPS:
+            return forwarded[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else "unknown"
+
+
+def overload_response(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": detail},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    budget = admission.classify(request.method, request.url.path) if ADMISSION_ENABLED else None
+    if budget is None or snapshot_store.serves(request.method, request.url.path):
+        # Unbudgeted routes and aggregates answered from a prebuilt snapshot
+        return await call_next(request)
+
+    if admission.over_priority_share(budget.priority):
+        budget.counters["shed_priority"] += 1
+        return overload_response(503, "Server is busy, please retry shortly", ADMISSION_QUEUE_TIMEOUT)
+
+    client = client_key(request)
+    wait = admission.take_tokens(client, budget.cost)
+    if wait:
+        budget.counters["rate_limited"] += 1
+        return overload_response(429, "Rate limit exceeded", wait)
+
+    reason = await budget.acquire(ADMISSION_QUEUE_TIMEOUT)
+    if not reason and admission.over_priority_share(budget.priority):
+        # Load rose past this priority's share while the request was queued
+        budget.release()
+        budget.counters["shed_priority"] += 1
+        reason = "priority"
+    if reason:
+        # Shedding is our capacity problem, not the client's
+        admission.refund_tokens(client, budget.cost)
+        return overload_response(503, "Server is busy, please retry shortly", ADMISSION_QUEUE_TIMEOUT)
+
+    admission.global_active += 1
+    try:
+        return await call_next(request)
+    finally:
+        admission.global_active -= 1
+        budget.release()
+
+
 # CORS Configuration
 cors_origins = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
 app.add_middleware(
@@ -38,15 +309,784 @@ db = client[database_name]
 products_collection = db.products
 regions_collection = db.regions
 artisans_collection = db.artisans
+related_collection = db.related_products
+meta_collection = db.meta
+
+
+# Read Routing
+# Each read names an endpoint with a configurable read preference. Analytics
+# and map aggregates may be served by secondaries within a bounded staleness;
+# verification, product detail and read-after-write paths stay on the primary.
+# Override per endpoint with READ_PREFERENCES="stats=secondary,regions=nearest".
+# Secondary reads are capped at READ_MAX_TIME_MS so a lagging member fails the
+# read instead of holding a worker.
+READ_MAX_STALENESS_SECONDS = int(os.getenv("READ_MAX_STALENESS_SECONDS", "90"))
+READ_MAX_TIME_MS = int(os.getenv("READ_MAX_TIME_MS", "5000"))
+
+DEFAULT_READ_PREFERENCES = {
+    "verify": "primary",
+    "product_detail": "primary",
+    "product_batch": "primary",
+    "product_list": "primary",
+    "products_by_region": "secondaryPreferred",
+    "products_by_gi_tag": "secondaryPreferred",
+    "regions": "secondaryPreferred",
+    "gi_tags": "secondaryPreferred",
+    "stats": "secondaryPreferred",
+    "products_popular": "secondaryPreferred",
+    "artisan_list": "secondaryPreferred",
+    "artisan_detail": "secondaryPreferred",
+}
+
+READ_PREFERENCE_MODES = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def split_values(value: Optional[str]) -> List[str]:
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+
+def parse_read_preference(mode: str):
+    mode = mode.strip()
+    if mode == "primary":
+        return Primary()
+    if mode not in READ_PREFERENCE_MODES:
+        raise ValueError(f"Unknown read preference: {mode}")
+    # maxStalenessSeconds must be at least 90 and keeps lagging secondaries out
+    return READ_PREFERENCE_MODES[mode](max_staleness=READ_MAX_STALENESS_SECONDS)
+
+
+def load_read_preferences() -> Dict:
+    modes = dict(DEFAULT_READ_PREFERENCES)
+    for override in split_values(os.getenv("READ_PREFERENCES")):
+        endpoint, _, mode = override.partition("=")
+        if endpoint.strip() not in modes:
+            raise ValueError(f"Unknown endpoint in READ_PREFERENCES: {endpoint}")
+        modes[endpoint.strip()] = mode
+    return {endpoint: parse_read_preference(mode) for endpoint, mode in modes.items()}
+
+
+read_preferences = load_read_preferences()
+
+
+def read_collection(collection, endpoint: str):
+    """`collection` with the read preference configured for `endpoint`."""
+    return collection.with_options(read_preference=read_preferences[endpoint])
+
+
+class CausalClock:
+    """Latest cluster and operation time seen by this process's writes."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cluster_time = None
+        self.operation_time = None
+
+    def observe(self, session):
+        with self.lock:
+            if session.operation_time is not None and (
+                self.operation_time is None or session.operation_time > self.operation_time
+            ):
+                self.operation_time = session.operation_time
+                self.cluster_time = session.cluster_time
+
+    def advance(self, session):
+        with self.lock:
+            if self.operation_time is not None:
+                session.advance_cluster_time(self.cluster_time)
+                session.advance_operation_time(self.operation_time)
+
+
+causal_clock = CausalClock()
+
+
+@contextmanager
+def causal_session():
+    """Causally consistent session that starts after this process's latest write.
+
+    Reads in the session wait until the chosen member has applied that write,
+    so secondaries never return data older than what we just wrote; writes in
+    the session move the clock forward. Only writes and the rebuilds that must
+    see them (snapshots, popular rankings) use one; request reads accept the
+    bounded staleness of their read preference.
+    """
+    with client.start_session(causal_consistency=True) as session:
+        causal_clock.advance(session)
+        yield session
+        causal_clock.observe(session)
+
+
+# Reads always filter on is_active: True, so the hot indexes are partial and
+# leave deactivated products out entirely.
+ACTIVE_FILTER = {"is_active": True}
+
+PRODUCT_INDEXES = [
+    ("active_created", [("created_at", -1)]),
+    ("active_region_created", [("region", 1), ("created_at", -1)]),
+    ("active_gi_tag_created", [("gi_tag", 1), ("created_at", -1)]),
+    ("active_category_created", [("category", 1), ("created_at", -1)]),
+    ("active_price", [("price", 1)]),
+    ("active_artisan_created", [("artisan_id", 1), ("created_at", -1)]),
+    ("active_popularity", [("popularity", -1)]),
+]
+
+
+def ensure_indexes():
+    """Partial indexes over active products backing the list filters, facets and sort order."""
+    existing = products_collection.index_information()
+    for name, keys in PRODUCT_INDEXES:
+        info = existing.get(name)
+        if info and (info.get("partialFilterExpression") != ACTIVE_FILTER or list(info["key"]) != keys):
+            # Rebuild indexes from before they were partial
+            products_collection.drop_index(name)
+        products_collection.create_index(keys, name=name, partialFilterExpression=ACTIVE_FILTER)
+    
+    related_collection.create_index("related._id", name="related_product_id")
+    artisans_collection.create_index("name_key", name="name_key", unique=True)
+    artisans_collection.create_index([("product_count", -1), ("name", 1)], name="product_count_name")
+    artisans_collection.create_index("regions", name="regions")
+    artisans_collection.create_index("gi_tags", name="gi_tags")
+
+
+@app.on_event("startup")
+async def startup():
+    # Handlers that talk to MongoDB are plain functions run in this threadpool,
+    # so give it a thread for every request admission control lets through
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = max(limiter.total_tokens, ADMISSION_GLOBAL_LIMIT)
+    try:
+        ensure_indexes()
+    except Exception:
+        logger.exception("Failed to create indexes")
+    try:
+        link_unassigned_products()
+    except Exception:
+        logger.exception("Failed to link products to artisans")
+    app.state.background_tasks = [
+        asyncio.create_task(flush_popularity()),
+        asyncio.create_task(refresh_related())
+    ]
+    if SNAPSHOTS_ENABLED:
+        app.state.background_tasks.append(asyncio.create_task(refresh_snapshots()))
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    for task in getattr(app.state, "background_tasks", []):
+        task.cancel()
+    try:
+        sync_popularity_epoch()
+        view_counter.flush()
+    except Exception:
+        logger.exception("Failed to flush view counters")
 
 
 # Helper function to convert ObjectId to string
 def serialize_doc(doc):
     if doc and "_id" in doc:
         doc["_id"] = str(doc["_id"])
+    if doc and isinstance(doc.get("artisan_id"), ObjectId):
+        doc["artisan_id"] = str(doc["artisan_id"])
     return doc
 
 
+def utc_now() -> datetime:
+    """Current UTC time truncated to milliseconds, the precision MongoDB stores,
+    so `updated_at` round-trips exactly for optimistic concurrency checks."""
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+# Product Change Events
+# Every product mutation emits exactly one event. Caches, the related-products
+# index and other derived data subscribe here instead of being updated inline
+# by each endpoint.
+product_change_listeners = []
+
+
+def on_product_change(listener):
+    """Register `listener(event)` for product change events."""
+    product_change_listeners.append(listener)
+    return listener
+
+
+def emit_product_change(event_type: str, before: Optional[Dict], after: Optional[Dict]):
+    """Notify listeners of a "created", "updated" or "deactivated" product.
+
+    `before`/`after` are the raw documents (ObjectId `_id`) around the change.
+    Listeners maintain derived data, so a failing listener is logged rather
+    than failing the write that already succeeded.
+    """
+    product = after or before
+    event = {
+        "type": event_type,
+        "product_id": str(product["_id"]),
+        "before": before,
+        "after": after,
+        "at": utc_now()
+    }
+    for listener in product_change_listeners:
+        try:
+            listener(event)
+        except Exception:
+            logger.exception("Product change listener %s failed for %s", listener.__name__, event["product_id"])
+
+
+class TTLCache:
+    """Small in-process LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value):
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def delete(self, key):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+
+# Fields returned by multi-get; long text (description, cultural_story) is left
+# to the detail endpoint.
+PRODUCT_SUMMARY_PROJECTION = {
+    "name": 1,
+    "gi_tag": 1,
+    "region": 1,
+    "artisan_name": 1,
+    "price": 1,
+    "category": 1,
+    "image_url": 1,
+    "barcode": 1,
+    "location": 1,
+}
+
+MAX_BATCH_IDS = int(os.getenv("MAX_BATCH_IDS", "100"))
+
+product_cache = TTLCache(
+    maxsize=int(os.getenv("PRODUCT_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("PRODUCT_CACHE_TTL", "30")),
+)
+
+
+class ProductBatchRequest(BaseModel):
+    ids: List[str]
+
+
+class ProductUpdate(BaseModel):
+    """Partial update; `expected_updated_at` must match the stored `updated_at`."""
+    expected_updated_at: datetime
+    name: Optional[str] = None
+    description: Optional[str] = None
+    gi_tag: Optional[str] = None
+    region: Optional[str] = None
+    artisan_name: Optional[str] = None
+    artisan_contact: Optional[str] = None
+    price: Optional[float] = None
+    category: Optional[str] = None
+    image_url: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    cultural_story: Optional[str] = None
+
+
+class ProductDeactivate(BaseModel):
+    expected_updated_at: datetime
+
+
+# Related Products
+# Top-K similar products are precomputed per product and stored in
+# `related_products`, so a detail page needs a single lookup. Similarity
+# combines shared GI tag / region / category, geographic proximity and
+# description + cultural story term overlap, scored with numpy in row blocks.
+RELATED_TOP_K = int(os.getenv("RELATED_TOP_K", "8"))
+RELATED_BLOCK_SIZE = 256
+RELATED_MAX_TERMS = 2048
+RELATED_DISTANCE_SCALE_KM = 300.0
+RELATED_SYNC_INTERVAL = float(os.getenv("RELATED_SYNC_INTERVAL", "600"))
+RELATED_WEIGHTS = {
+    "gi_tag": 3.0,
+    "region": 2.0,
+    "category": 1.0,
+    "distance": 1.5,
+    "text": 2.0,
+}
+
+RELATED_SUMMARY_FIELDS = ["name", "gi_tag", "region", "artisan_name", "price", "image_url"]
+
+RELATED_SOURCE_PROJECTION = {
+    field: 1 for field in RELATED_SUMMARY_FIELDS + ["category", "location", "description", "cultural_story"]
+}
+
+EARTH_RADIUS_KM = 6371.0
+TERM_RE = re.compile(r"[a-z]{3,}")
+STOP_WORDS = {
+    "the", "and", "for", "are", "with", "from", "this", "that", "these", "those", "was", "were",
+    "has", "have", "had", "its", "their", "them", "they", "into", "over", "under", "which",
+    "who", "whom", "been", "being", "also", "such", "made", "using", "used", "each", "other",
+    "more", "most", "very", "than", "then", "there", "where", "when", "while", "about", "all",
+}
+
+
+def product_terms(product: Dict) -> set:
+    text = " ".join(filter(None, [product.get("description"), product.get("cultural_story")]))
+    return {term for term in TERM_RE.findall(text.lower()) if term not in STOP_WORDS}
+
+
+def related_summary(product: Dict) -> Dict:
+    summary = {field: product.get(field) for field in RELATED_SUMMARY_FIELDS}
+    summary["_id"] = str(product["_id"])
+    return summary
+
+
+# Per-row arrays of RelatedIndex, views onto buffers with spare capacity
+RELATED_ROW_ARRAYS = ["coords", "term_matrix", "term_counts", "top_scores", "ranked", "active"]
+
+
+class RelatedIndex:
+    """In-memory feature arrays of the active catalogue for vectorized scoring."""
+
+    def __init__(self):
+        self.loaded_at = None
+        self.ids = []
+        self.positions = {}
+        self.summaries = []
+        self.codes = {"gi_tag": {}, "region": {}, "category": {}}
+        self.columns = {key: np.empty(0, dtype=np.int64) for key in self.codes}
+        self.coords = np.empty((0, 2))
+        self.vocabulary = {}
+        self.term_matrix = np.empty((0, 0), dtype=np.float32)
+        self.term_counts = np.empty(0, dtype=np.float32)
+        # Descending top-K scores already stored for each product; -inf pads
+        # products with fewer than K related entries.
+        self.top_scores = np.empty((0, RELATED_TOP_K))
+        # Whether a product has a stored ranking document
+        self.ranked = np.empty(0, dtype=bool)
+        # Deactivated rows stay in place but never score
+        self.active = np.empty(0, dtype=bool)
+        self.capacity = 0
+        self.buffers = self._current_arrays()
+
+    def _current_arrays(self) -> Dict:
+        return {**self.columns, **{name: getattr(self, name) for name in RELATED_ROW_ARRAYS}}
+
+    def _resize(self, size: int):
+        """Expose the first `size` rows of the buffers, doubling them when full.
+
+        The public arrays are views, so adding a product copies them only when
+        the capacity runs out rather than on every add.
+        """
+        if size > self.capacity:
+            self.capacity = max(size, 2 * self.capacity, 64)
+            for name, buffer in self.buffers.items():
+                grown = np.empty((self.capacity,) + buffer.shape[1:], dtype=buffer.dtype)
+                grown[:len(buffer)] = buffer
+                self.buffers[name] = grown
+        for key in self.columns:
+            self.columns[key] = self.buffers[key][:size]
+        for name in RELATED_ROW_ARRAYS:
+            setattr(self, name, self.buffers[name][:size])
+
+    def load(self, products: List[Dict]):
+        """Build feature arrays for `products`, fixing the term vocabulary."""
+        self.__init__()
+        document_frequency = {}
+        product_term_sets = []
+        for product in products:
+            terms = product_terms(product)
+            product_term_sets.append(terms)
+            for term in terms:
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+        # Terms unique to one product cannot create overlap, so skip them
+        shared_terms = sorted(
+            (term for term, count in document_frequency.items() if count > 1),
+            key=lambda term: -document_frequency[term]
+        )[:RELATED_MAX_TERMS]
+        self.vocabulary = {term: i for i, term in enumerate(shared_terms)}
+
+        rows = [self._features(product, terms) for product, terms in zip(products, product_term_sets)]
+        for product in products:
+            self.positions[str(product["_id"])] = len(self.ids)
+            self.ids.append(str(product["_id"]))
+            self.summaries.append(related_summary(product))
+        for i, key in enumerate(self.codes):
+            self.columns[key] = np.array([row[0][i] for row in rows], dtype=np.int64)
+        self.coords = np.array([row[1] for row in rows], dtype=float).reshape(-1, 2)
+        self.term_matrix = np.zeros((len(rows), len(self.vocabulary)), dtype=np.float32)
+        for position, row in enumerate(rows):
+            self.term_matrix[position, row[2]] = 1.0
+        self.term_counts = self.term_matrix.sum(axis=1)
+        self.top_scores = np.full((len(rows), RELATED_TOP_K), -np.inf)
+        self.ranked = np.zeros(len(rows), dtype=bool)
+        self.active = np.ones(len(rows), dtype=bool)
+        self.buffers = self._current_arrays()
+        self.capacity = len(rows)
+        self.loaded_at = time.monotonic()
+
+    def _code(self, key: str, value: Optional[str], assign: bool = True) -> int:
+        if not value:
+            return -1
+        value = value.strip().lower()
+        if not assign:
+            # An unseen value matches nothing, like a missing one
+            return self.codes[key].get(value, -1)
+        return self.codes[key].setdefault(value, len(self.codes[key]))
+
+    def _features(self, product: Dict, terms: set, assign: bool = True):
+        """Categorical codes, (lat, lng) in radians and vocabulary columns of one product."""
+        codes = [self._code(key, product.get(key), assign) for key in self.codes]
+        location = product.get("location") or {}
+        latitude, longitude = location.get("latitude"), location.get("longitude")
+        if latitude is not None and longitude is not None:
+            point = [math.radians(latitude), math.radians(longitude)]
+        else:
+            point = [np.nan, np.nan]
+        columns = [self.vocabulary[term] for term in terms if term in self.vocabulary]
+        return codes, point, columns
+
+    def add(self, product: Dict) -> int:
+        """Add one product to the index, returning its row position."""
+        product_id = str(product["_id"])
+        if product_id in self.positions:
+            return self.positions[product_id]
+
+        codes, point, columns = self._features(product, product_terms(product))
+        position = len(self.ids)
+        self._resize(position + 1)
+        self.positions[product_id] = position
+        self.ids.append(product_id)
+        self.summaries.append(related_summary(product))
+        for key, code in zip(self.codes, codes):
+            self.columns[key][position] = code
+        self.coords[position] = point
+        self.term_matrix[position] = 0.0
+        self.term_matrix[position, columns] = 1.0
+        self.term_counts[position] = len(columns)
+        self.top_scores[position] = -np.inf
+        self.ranked[position] = False
+        self.active[position] = True
+        return position
+
+    def update(self, product: Dict) -> int:
+        """Replace one product's features in place, adding it if unknown."""
+        product_id = str(product["_id"])
+        position = self.positions.get(product_id)
+        if position is None:
+            return self.add(product)
+
+        codes, point, columns = self._features(product, product_terms(product))
+        self.summaries[position] = related_summary(product)
+        for key, code in zip(self.codes, codes):
+            self.columns[key][position] = code
+        self.coords[position] = point
+        self.term_matrix[position] = 0.0
+        self.term_matrix[position, columns] = 1.0
+        self.term_counts[position] = len(columns)
+        self.active[position] = True
+        return position
+
+    def deactivate(self, position: int):
+        self.active[position] = False
+        self.ranked[position] = False
+        self.top_scores[position] = -np.inf
+
+    def set_ranking(self, position: int, entries: List[Dict]):
+        self.top_scores[position] = -np.inf
+        self.top_scores[position, :len(entries)] = [entry["score"] for entry in entries]
+        self.ranked[position] = True
+
+    def score_rows(self, rows: np.ndarray) -> np.ndarray:
+        """Similarity of `rows` against every indexed product, shape (len(rows), n)."""
+        scores = self._score(
+            {key: self.columns[key][rows] for key in self.codes},
+            self.coords[rows],
+            self.term_matrix[rows],
+            self.term_counts[rows]
+        )
+        scores[np.arange(len(rows)), rows] = -np.inf
+        return scores
+
+    def score_product(self, product: Dict) -> np.ndarray:
+        """Similarity of a product outside the index against every indexed product."""
+        codes, point, columns = self._features(product, product_terms(product), assign=False)
+        terms = np.zeros((1, len(self.vocabulary)), dtype=np.float32)
+        terms[0, columns] = 1.0
+        return self._score(
+            {key: np.array([code]) for key, code in zip(self.codes, codes)},
+            np.array([point], dtype=float),
+            terms,
+            terms.sum(axis=1)
+        )[0]
+
+    def _score(self, codes: Dict, coords: np.ndarray, terms: np.ndarray, term_counts: np.ndarray) -> np.ndarray:
+        scores = np.zeros((len(coords), len(self.ids)))
+        for key in self.codes:
+            column = self.columns[key]
+            same = (codes[key][:, None] == column[None, :]) & (codes[key][:, None] >= 0)
+            scores += RELATED_WEIGHTS[key] * same
+
+        lat, lng = self.coords[:, 0], self.coords[:, 1]
+        row_lat, row_lng = coords[:, 0, None], coords[:, 1, None]
+        haversine = (
+            np.sin((lat[None, :] - row_lat) / 2) ** 2
+            + np.cos(row_lat) * np.cos(lat[None, :]) * np.sin((lng[None, :] - row_lng) / 2) ** 2
+        )
+        distance_km = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(haversine, 0.0, 1.0)))
+        scores += RELATED_WEIGHTS["distance"] * np.nan_to_num(np.exp(-distance_km / RELATED_DISTANCE_SCALE_KM))
+
+        if self.term_matrix.shape[1]:
+            overlap = terms @ self.term_matrix.T
+            union = term_counts[:, None] + self.term_counts[None, :] - overlap
+            jaccard = np.divide(overlap, union, out=np.zeros_like(overlap), where=union > 0)
+            scores += RELATED_WEIGHTS["text"] * jaccard
+
+        scores[:, ~self.active] = -np.inf
+        return scores
+
+    def top_k(self, scores: np.ndarray) -> List[List[int]]:
+        """Column positions of the best positive scores per row, best first."""
+        k = min(RELATED_TOP_K, scores.shape[1])
+        if k <= 0:
+            return [[] for _ in range(len(scores))]
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, columns in enumerate(candidates):
+            columns = columns[np.argsort(-scores[row, columns])]
+            results.append([int(c) for c in columns if scores[row, c] > 0])
+        return results
+
+    def entries(self, row_scores: np.ndarray, columns: List[int]) -> List[Dict]:
+        return [
+            {**self.summaries[c], "score": round(float(row_scores[c]), 4)}
+            for c in columns
+        ]
+
+
+related_index = RelatedIndex()
+# Guards related_index, which the background sync swaps and requests extend
+related_lock = threading.Lock()
+# While a sync loads a fresh index, changes applied to the current one are
+# journaled and replayed onto the new index before it is swapped in
+related_sync_state = {"journal": None}
+
+
+def journal_related_change(event_type: str, product: Dict):
+    """Record a change for the index being loaded. Call with related_lock held."""
+    if related_sync_state["journal"] is not None:
+        related_sync_state["journal"].append((event_type, product))
+
+
+def load_related_index() -> RelatedIndex:
+    """Build an index from the active catalogue and its stored rankings."""
+    index = RelatedIndex()
+    index.load(list(products_collection.find({"is_active": True}, RELATED_SOURCE_PROJECTION)))
+    for doc in related_collection.find({}, {"related.score": 1}):
+        position = index.positions.get(str(doc["_id"]))
+        if position is None:
+            continue
+        stored = [entry["score"] for entry in doc.get("related", [])][:RELATED_TOP_K]
+        index.top_scores[position, :len(stored)] = stored
+        index.ranked[position] = True
+    return index
+
+
+def rank_rows(index: RelatedIndex, positions, push: bool = True, exclude=()) -> Dict[int, List[Dict]]:
+    """Store the top-K lists of `positions`, scored in blocks.
+
+    With `push`, each product is also inserted into the stored lists of
+    already-ranked products whose K-th score it now beats (similarity is
+    symmetric), except those in `exclude`. Returns the entries per position.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    now = datetime.utcnow()
+    can_receive = index.ranked.copy()
+    can_receive[positions] = False
+    can_receive[list(exclude)] = False
+    results = {}
+    for start in range(0, len(positions), RELATED_BLOCK_SIZE):
+        rows = positions[start:start + RELATED_BLOCK_SIZE]
+        scores = index.score_rows(rows)
+        operations = []
+        for offset, columns in enumerate(index.top_k(scores)):
+            position = int(rows[offset])
+            entries = index.entries(scores[offset], columns)
+            index.set_ranking(position, entries)
+            results[position] = entries
+            operations.append(ReplaceOne(
+                {"_id": ObjectId(index.ids[position])},
+                {"related": entries, "computed_at": now},
+                upsert=True
+            ))
+            if not push:
+                continue
+
+            summary = index.summaries[position]
+            row_scores = scores[offset]
+            for other in np.nonzero(can_receive & (row_scores > 0) & (row_scores > index.top_scores[:, -1]))[0]:
+                score = round(float(row_scores[other]), 4)
+                merged = np.sort(np.append(index.top_scores[other], score))[::-1]
+                index.top_scores[other] = merged[:RELATED_TOP_K]
+                # Only existing rankings are extended; unranked products get a
+                # full list from the next sync instead of a one-item stub.
+                operations.append(UpdateOne(
+                    {"_id": ObjectId(index.ids[other]), "related._id": {"$ne": summary["_id"]}},
+                    {
+                        "$push": {"related": {"$each": [{**summary, "score": score}], "$sort": {"score": -1}, "$slice": RELATED_TOP_K}},
+                        "$set": {"computed_at": now}
+                    }
+                ))
+        related_collection.bulk_write(operations, ordered=False)
+    return results
+
+
+@contextmanager
+def reloaded_related_index():
+    """Load a fresh index and yield it under related_lock, with the changes
+    made while it was loading replayed onto it. The caller swaps it in."""
+    with related_lock:
+        related_sync_state["journal"] = []
+    try:
+        index = load_related_index()
+    except Exception:
+        with related_lock:
+            related_sync_state["journal"] = None
+        raise
+    with related_lock:
+        journal, related_sync_state["journal"] = related_sync_state["journal"], None
+        for event_type, product in journal:
+            if event_type == "deactivated":
+                position = index.positions.get(str(product["_id"]))
+                if position is not None:
+                    index.deactivate(position)
+            else:
+                index.update(product)
+        yield index
+
+
+def rebuild_related_products() -> int:
+    """Recompute top-K related products for the whole catalogue."""
+    global related_index
+    with reloaded_related_index() as index:
+        rank_rows(index, np.arange(len(index.ids)), push=False)
+        related_index = index
+    related_collection.delete_many({"_id": {"$nin": [ObjectId(i) for i in index.ids]}})
+    return len(index.ids)
+
+
+def sync_related_products() -> int:
+    """Reload the index and rank products that have no stored list yet
+    (seeded directly, or created by another worker)."""
+    global related_index
+    with reloaded_related_index() as index:
+        unranked = np.nonzero(~index.ranked)[0]
+        if len(unranked):
+            rank_rows(index, unranked)
+        related_index = index
+    return len(unranked)
+
+
+async def refresh_related():
+    while True:
+        try:
+            await asyncio.to_thread(sync_related_products)
+        except Exception:
+            logger.exception("Failed to sync related products")
+        await asyncio.sleep(RELATED_SYNC_INTERVAL)
+
+
+def add_related_product(product: Dict) -> List[Dict]:
+    """Rank a new product and insert it into the lists it now belongs to.
+
+    Until the background sync has loaded the index this is a no-op; the next
+    sync ranks the product instead.
+    """
+    with related_lock:
+        journal_related_change("created", product)
+        if related_index.loaded_at is None:
+            return []
+        position = related_index.add(product)
+        return rank_rows(related_index, [position])[position]
+
+
+def preview_related_products(product: Dict) -> List[Dict]:
+    """Score an unranked product in memory without storing or indexing it."""
+    if not related_lock.acquire(blocking=False):
+        return []
+    try:
+        if related_index.loaded_at is None:
+            return []
+        position = related_index.positions.get(str(product["_id"]))
+        if position is not None:
+            scores = related_index.score_rows(np.array([position]))
+        else:
+            scores = related_index.score_product(product)[None, :]
+        return related_index.entries(scores[0], related_index.top_k(scores)[0])
+    finally:
+        related_lock.release()
+
+
+@on_product_change
+def update_related_products(event: Dict):
+    if event["type"] == "created":
+        add_related_product(event["after"])
+        return
+
+    # Take the product out of every stored list and drop its own ranking, then
+    # update its row in place and rescore only the lists it was removed from.
+    product_id = event["product_id"]
+    with related_lock:
+        journal_related_change(event["type"], event["after"])
+        holders = [str(doc["_id"]) for doc in related_collection.find({"related._id": product_id}, {"_id": 1})]
+        related_collection.update_many(
+            {"related._id": product_id},
+            {"$pull": {"related": {"_id": product_id}}}
+        )
+        related_collection.delete_one({"_id": ObjectId(product_id)})
+        if related_index.loaded_at is None:
+            # The next sync ranks everything from scratch
+            return
+
+        if event["type"] == "deactivated":
+            position = related_index.positions.get(product_id)
+            if position is not None:
+                related_index.deactivate(position)
+        else:
+            position = related_index.update(event["after"])
+            related_index.ranked[position] = False
+
+        holder_positions = [
+            related_index.positions[holder] for holder in holders
+            if holder in related_index.positions and related_index.active[related_index.positions[holder]]
+        ]
+        if holder_positions:
+            rank_rows(related_index, holder_positions, push=False)
+        if event["type"] == "updated":
+            rank_rows(related_index, [position], exclude=holder_positions)
+
+
 @app.get("/")
 async def root():
     return {
@@ -65,13 +1105,22 @@ async def health_check():
         return {"status": "unhealthy", "error": str(e)}
 
 
+@app.get("/api/admission/stats")
+async def get_admission_stats():
+    """Admission control counters: admitted, queued and shed requests per route"""
+    return {
+        "success": True,
+        "admission": admission.stats()
+    }
+
+
 def generate_barcode() -> str:
     """Generate a unique verification barcode (e.g. HC-A1B2C3D4)."""
     return "HC-" + secrets.token_hex(4).upper()
 
 
 @app.post("/api/products")
-async def create_product(
+def create_product(
     name: str = Form(...),
     description: str = Form(...),
     gi_tag: str = Form(...),
@@ -104,11 +1153,14 @@ async def create_product(
             while products_collection.find_one({"barcode": barcode_value}):
                 barcode_value = generate_barcode()
         
+        now = utc_now()
+        artisan_id = get_or_create_artisan(artisan_name, artisan_contact)
         product = {
             "name": name,
             "description": description,
             "gi_tag": gi_tag,
             "region": region,
+            "artisan_id": artisan_id,
             "artisan_name": artisan_name,
             "artisan_contact": artisan_contact,
             "price": price_float,
@@ -120,12 +1172,15 @@ async def create_product(
                 "longitude": lng_float
             } if lat_float and lng_float else None,
             "cultural_story": cultural_story,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow(),
+            "created_at": now,
+            "updated_at": now,
             "is_active": True
         }
         
-        result = products_collection.insert_one(product)
+        with causal_session() as session:
+            result = products_collection.insert_one(product, session=session)
+        emit_product_change("created", None, dict(product))
+        
         product["_id"] = str(result.inserted_id)
         
         return {
@@ -139,101 +1194,257 @@ async def create_product(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Facet counts are computed in the same $facet pass as the page of results
+# and cached per filter combination, so repeat visits cost a single find.
+PRICE_BUCKET_BOUNDARIES = [0, 1000, 2500, 5000, 10000, 25000, 50000]
+
+facet_cache = TTLCache(
+    maxsize=int(os.getenv("FACET_CACHE_SIZE", "500")),
+    ttl=float(os.getenv("FACET_CACHE_TTL", "60")),
+)
+
+
+@on_product_change
+def invalidate_product_caches(event: Dict):
+    product_cache.delete(event["product_id"])
+    facet_cache.clear()
+
+
+def facet_pipeline_branches(filters: Dict) -> Dict:
+    """$facet branches for the facet counts.
+
+    `filters` holds the faceted conditions (category, region, gi_tag, price).
+    Each facet branch applies every filter except its own, so picking
+    "Textiles" still shows the counts of the other categories.
+    """
+    def filtered_by_all_but(field: Optional[str]) -> List[Dict]:
+        match = {key: condition for key, condition in filters.items() if key != field}
+        return [{"$match": match}] if match else []
+
+    branches = {
+        "price_range": filtered_by_all_but("price") + [
+            {"$match": {"price": {"$ne": None}}},
+            {"$group": {"_id": None, "min": {"$min": "$price"}, "max": {"$max": "$price"}}}
+        ],
+        # Prices below the first boundary would otherwise land in "over"
+        "price": filtered_by_all_but("price") + [
+            {"$match": {"price": {"$gte": PRICE_BUCKET_BOUNDARIES[0]}}},
+            {
+                "$bucket": {
+                    "groupBy": "$price",
+                    "boundaries": PRICE_BUCKET_BOUNDARIES,
+                    "default": "over",
+                    "output": {"count": {"$sum": 1}}
+                }
+            }
+        ],
+    }
+    for field in ["category", "region", "gi_tag"]:
+        branches[field] = filtered_by_all_but(field) + [
+            {"$match": {field: {"$ne": None}}},
+            {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}}
+        ]
+    return branches
+
+
+def format_facets(result: Dict) -> Dict:
+    price_buckets = []
+    for bucket in result.get("price", []):
+        if bucket["_id"] == "over":
+            lower, upper = PRICE_BUCKET_BOUNDARIES[-1], None
+        else:
+            index = PRICE_BUCKET_BOUNDARIES.index(bucket["_id"])
+            lower, upper = PRICE_BUCKET_BOUNDARIES[index], PRICE_BUCKET_BOUNDARIES[index + 1]
+        price_buckets.append({"min": lower, "max": upper, "count": bucket["count"]})
+    price_range = result.get("price_range") or [{}]
+
+    return {
+        "category": [{"value": f["_id"], "count": f["count"]} for f in result.get("category", [])],
+        "region": [{"value": f["_id"], "count": f["count"]} for f in result.get("region", [])],
+        "gi_tag": [{"value": f["_id"], "count": f["count"]} for f in result.get("gi_tag", [])],
+        "price": price_buckets,
+        "price_range": {"min": price_range[0].get("min"), "max": price_range[0].get("max")}
+    }
+
+
 @app.get("/api/products")
-async def get_products(
+def get_products(
     region: Optional[str] = None,
     gi_tag: Optional[str] = None,
+    category: Optional[str] = None,
     artisan_name: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    facets: bool = False,
     limit: int = 50,
     skip: int = 0
 ):
-    """Get products with optional filtering by region, GI tag, or artisan"""
+    """Get products filtered by region, GI tag, category (comma-separated exact
+    values), artisan and price range, optionally with facet counts"""
     try:
-        pipeline = []
-        
-        # Match stage for filtering
-        match_stage = {"is_active": True}
-        if region:
-            match_stage["region"] = {"$regex": region, "$options": "i"}
-        if gi_tag:
-            match_stage["gi_tag"] = {"$regex": gi_tag, "$options": "i"}
+        # Match stage for filtering: base conditions apply to every facet,
+        # faceted ones are dropped from their own facet's counts
+        base_match = {"is_active": True}
         if artisan_name:
-            match_stage["artisan_name"] = {"$regex": artisan_name, "$options": "i"}
-        
-        pipeline.append({"$match": match_stage})
+            base_match["artisan_name"] = {"$regex": artisan_name, "$options": "i"}
+        facet_filters = {}
+        for field, value in [("region", region), ("gi_tag", gi_tag), ("category", category)]:
+            values = split_values(value)
+            if values:
+                facet_filters[field] = {"$in": values}
+        if min_price is not None or max_price is not None:
+            facet_filters["price"] = {}
+            if min_price is not None:
+                facet_filters["price"]["$gte"] = min_price
+            if max_price is not None:
+                facet_filters["price"]["$lte"] = max_price
+        match_stage = {**base_match, **facet_filters}
         
-        # Sort by creation date (newest first)
-        pipeline.append({"$sort": {"created_at": -1}})
+        cache_key = json.dumps(match_stage, sort_keys=True)
+        collection = read_collection(products_collection, "product_list")
         
-        # Pagination
-        pipeline.append({"$skip": skip})
-        pipeline.append({"$limit": limit})
-        
-        products = list(products_collection.aggregate(pipeline))
-        
-        # Get total count for pagination
-        count_pipeline = [{"$match": match_stage}, {"$count": "total"}]
-        count_result = list(products_collection.aggregate(count_pipeline))
-        total = count_result[0]["total"] if count_result else 0
+        # The page and total use the partial indexes; $facet sub-pipelines
+        # cannot, so the facet counts are only aggregated when asked for
+        products = list(
+            collection.find(match_stage)
+            .sort("created_at", -1)
+            .skip(skip)
+            .limit(limit)
+        )
+        total = facet_cache.get(f"total:{cache_key}")
+        if total is None:
+            total = collection.count_documents(match_stage)
+            facet_cache.set(f"total:{cache_key}", total)
         
         for product in products:
             product = serialize_doc(product)
         
-        return {
+        response = {
             "success": True,
             "products": products,
             "total": total,
             "limit": limit,
             "skip": skip
         }
+        if facets:
+            counts = facet_cache.get(f"facets:{cache_key}")
+            if counts is None:
+                result = list(collection.aggregate([
+                    {"$match": base_match},
+                    {"$facet": facet_pipeline_branches(facet_filters)}
+                ]))[0]
+                counts = format_facets(result)
+                facet_cache.set(f"facets:{cache_key}", counts)
+            response["facets"] = counts
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def build_products_by_region_payload(session=None) -> Dict:
+    """Products grouped by region for the map"""
+    pipeline = [
+        {"$match": {"is_active": True}},
+        {
+            "$group": {
+                "_id": "$region",
+                "products": {
+                    "$push": {
+                        "_id": "$_id",
+                        "name": "$name",
+                        "gi_tag": "$gi_tag",
+                        "image_url": "$image_url",
+                        "artisan_name": "$artisan_name",
+                        "price": "$price",
+                        "location": "$location",
+                        "description": "$description"
+                    }
+                },
+                "count": {"$sum": 1},
+                "gi_tags": {"$addToSet": "$gi_tag"},
+                "avg_latitude": {"$avg": "$location.latitude"},
+                "avg_longitude": {"$avg": "$location.longitude"}
+            }
+        },
+        {
+            "$project": {
+                "region": "$_id",
+                "products": 1,
+                "count": 1,
+                "gi_tags": 1,
+                "location": {
+                    "latitude": "$avg_latitude",
+                    "longitude": "$avg_longitude"
+                },
+                "_id": 0
+            }
+        },
+        {"$sort": {"count": -1}}
+    ]
+
+    collection = read_collection(products_collection, "products_by_region")
+    results = list(collection.aggregate(pipeline, session=session, maxTimeMS=READ_MAX_TIME_MS))
+
+    # Serialize ObjectIds
+    for result in results:
+        for product in result.get("products", []):
+            if "_id" in product:
+                product["_id"] = str(product["_id"])
+
+    return {
+        "success": True,
+        "regions": results
+    }
+
+
 @app.get("/api/products/by-region")
-async def get_products_by_region():
+def get_products_by_region(request: Request):
     """Get products grouped by region using aggregation pipeline"""
+    try:
+        return snapshot_response(request, "products_by_region") or build_products_by_region_payload()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/products/by-gi-tag")
+def get_products_by_gi_tag():
+    """Get products grouped by GI tag using aggregation pipeline"""
     try:
         pipeline = [
             {"$match": {"is_active": True}},
             {
                 "$group": {
-                    "_id": "$region",
+                    "_id": "$gi_tag",
                     "products": {
                         "$push": {
                             "_id": "$_id",
                             "name": "$name",
-                            "gi_tag": "$gi_tag",
+                            "region": "$region",
                             "image_url": "$image_url",
                             "artisan_name": "$artisan_name",
                             "price": "$price",
-                            "location": "$location",
-                            "description": "$description"
+                            "cultural_story": "$cultural_story"
                         }
                     },
                     "count": {"$sum": 1},
-                    "gi_tags": {"$addToSet": "$gi_tag"},
-                    "avg_latitude": {"$avg": "$location.latitude"},
-                    "avg_longitude": {"$avg": "$location.longitude"}
+                    "regions": {"$addToSet": "$region"}
                 }
             },
             {
                 "$project": {
-                    "region": "$_id",
+                    "gi_tag": "$_id",
                     "products": 1,
                     "count": 1,
-                    "gi_tags": 1,
-                    "location": {
-                        "latitude": "$avg_latitude",
-                        "longitude": "$avg_longitude"
-                    },
+                    "regions": 1,
                     "_id": 0
                 }
             },
             {"$sort": {"count": -1}}
         ]
         
-        results = list(products_collection.aggregate(pipeline))
+        collection = read_collection(products_collection, "products_by_gi_tag")
+        results = list(collection.aggregate(pipeline, maxTimeMS=READ_MAX_TIME_MS))
         
         # Serialize ObjectIds
         for result in results:
@@ -243,83 +1454,327 @@ async def get_products_by_region():
         
         return {
             "success": True,
-            "regions": results
+            "gi_tags": results
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/products/by-gi-tag")
-async def get_products_by_gi_tag():
-    """Get products grouped by GI tag using aggregation pipeline"""
+@app.get("/api/products/verify")
+def verify_product_by_barcode(barcode: Optional[str] = None):
+    """Verify a product by barcode or verification code. Returns product if found."""
+    if not barcode or not barcode.strip():
+        raise HTTPException(status_code=400, detail="Barcode or verification code is required")
+    code = barcode.strip().upper()
+    if not code.startswith("HC-"):
+        code = "HC-" + code
     try:
-        pipeline = [
-            {"$match": {"is_active": True}},
-            {
-                "$group": {
-                    "_id": "$gi_tag",
-                    "products": {
-                        "$push": {
-                            "_id": "$_id",
-                            "name": "$name",
-                            "region": "$region",
-                            "image_url": "$image_url",
-                            "artisan_name": "$artisan_name",
-                            "price": "$price",
-                            "cultural_story": "$cultural_story"
-                        }
-                    },
-                    "count": {"$sum": 1},
-                    "regions": {"$addToSet": "$region"}
-                }
-            },
+        collection = read_collection(products_collection, "verify")
+        product = collection.find_one({"barcode": code, "is_active": True})
+        if not product:
+            product = collection.find_one({"barcode": barcode.strip(), "is_active": True})
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found. This barcode may be invalid or the product may be inactive.")
+        view_counter.record(product["_id"], "scans")
+        return {
+            "success": True,
+            "verified": True,
+            "product": serialize_doc(product)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Popularity
+# Views and verification scans are counted in memory and flushed periodically
+# as one bulk_write of $inc operations, so the hottest read paths never wait on
+# a write. Scores decay exponentially: each hit adds 2^(t / half-life) measured
+# from an epoch, so the stored sum only ever grows by plain $inc and dividing
+# by the current weight gives the decayed score. The weights grow without
+# bound, so once the epoch is POPULARITY_REBASE_HALF_LIVES old it is moved to
+# the present and every stored score is divided by the weight in between. The
+# epoch lives in the meta collection so all workers share it.
+VIEW_FLUSH_INTERVAL = float(os.getenv("VIEW_FLUSH_INTERVAL", "10"))
+POPULAR_REFRESH_INTERVAL = float(os.getenv("POPULAR_REFRESH_INTERVAL", "60"))
+POPULARITY_HALF_LIFE_DAYS = float(os.getenv("POPULARITY_HALF_LIFE_DAYS", "7"))
+POPULARITY_REBASE_HALF_LIVES = float(os.getenv("POPULARITY_REBASE_HALF_LIVES", "52"))
+POPULARITY_EPOCH = datetime(2024, 1, 1)
+POPULAR_LIMIT = 20
+# A verification scan signals stronger intent than a page view
+HIT_WEIGHTS = {"views": 1.0, "scans": 3.0}
+
+
+def popularity_weight(at: datetime, epoch: Optional[datetime] = None) -> float:
+    elapsed_days = (at - (epoch or popular_state["epoch"])).total_seconds() / 86400
+    return 2 ** (elapsed_days / POPULARITY_HALF_LIFE_DAYS)
+
+
+class ViewCounter:
+    """Buffers view/scan increments per product until the next flush."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+
+    def record(self, product_id: ObjectId, kind: str):
+        with self.lock:
+            weight = HIT_WEIGHTS[kind] * popularity_weight(datetime.utcnow())
+            counts = self.pending.setdefault(product_id, {"views": 0, "scans": 0, "popularity": 0.0})
+            counts[kind] += 1
+            counts["popularity"] += weight
+
+    def flush(self) -> int:
+        """Write buffered increments in one bulk_write. Returns products updated."""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return 0
+        operations = [
+            UpdateOne({"_id": product_id}, {"$inc": counts})
+            for product_id, counts in pending.items()
+        ]
+        try:
+            with causal_session() as session:
+                products_collection.bulk_write(operations, ordered=False, session=session)
+        except Exception:
+            # Put the increments back so the next flush retries them
+            with self.lock:
+                for product_id, counts in pending.items():
+                    merged = self.pending.setdefault(product_id, {"views": 0, "scans": 0, "popularity": 0.0})
+                    for field, value in counts.items():
+                        merged[field] += value
+            raise
+        return len(pending)
+
+    def rebase(self, epoch: datetime):
+        """Switch to a new epoch, rescaling the buffered scores to match."""
+        with self.lock:
+            current = popular_state["epoch"]
+            if epoch == current:
+                return
+            scale = 1 / popularity_weight(epoch, current)
+            for counts in self.pending.values():
+                counts["popularity"] *= scale
+            popular_state["epoch"] = epoch
+
+
+view_counter = ViewCounter()
+
+POPULAR_PROJECTION = {**PRODUCT_SUMMARY_PROJECTION, "views": 1, "scans": 1, "popularity": 1}
+
+# Precomputed rankings: {"global": [...], "region": {region: [...]}, "gi_tag": {tag: [...]}}
+popular_rankings = {"global": [], "region": {}, "gi_tag": {}}
+popular_state = {"refreshed_at": None, "stale": True, "epoch": POPULARITY_EPOCH}
+
+
+def sync_popularity_epoch():
+    """Pick up the shared epoch, and move it to now once it is due for a rebase.
+
+    Hits flushed by another worker between the epoch moving and the stored
+    scores being divided are scaled down with them; with a rebase roughly
+    once a year that is a few seconds of views.
+    """
+    doc = meta_collection.find_one({"_id": "popularity"})
+    epoch = doc["epoch"] if doc else POPULARITY_EPOCH
+    view_counter.rebase(epoch)
+
+    now = datetime.utcnow()
+    # BSON dates keep milliseconds; truncate so the stored epoch compares equal
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    if (now - epoch).total_seconds() / 86400 < POPULARITY_REBASE_HALF_LIVES * POPULARITY_HALF_LIFE_DAYS:
+        return
+    try:
+        claimed = meta_collection.find_one_and_update(
+            {"_id": "popularity", "epoch": epoch},
+            {"$set": {"epoch": now}},
+            upsert=doc is None
+        )
+    except DuplicateKeyError:
+        # Another worker created the epoch first; adopt it on the next sync
+        return
+    if claimed is None and doc is not None:
+        # Another worker moved the epoch first; adopt it on the next sync
+        return
+    products_collection.update_many(
+        {"popularity": {"$gt": 0}},
+        {"$mul": {"popularity": 1 / popularity_weight(now, epoch)}}
+    )
+    view_counter.rebase(now)
+    popular_state["stale"] = True
+
+
+def refresh_popular_rankings(session=None):
+    """Rebuild global, per-region and per-GI-tag rankings in one aggregation.
+
+    The flush loop passes a causal session so the rankings include the
+    counters it just wrote; the request-path fallback reads without one.
+    """
+    def grouped(field):
+        # $topN keeps only POPULAR_LIMIT documents per group in memory, so a
+        # large region never builds an oversized array (MongoDB 5.2+)
+        return [
             {
-                "$project": {
-                    "gi_tag": "$_id",
-                    "products": 1,
-                    "count": 1,
-                    "regions": 1,
-                    "_id": 0
+                "$group": {
+                    "_id": f"${field}",
+                    "products": {
+                        "$topN": {"n": POPULAR_LIMIT, "sortBy": {"popularity": -1}, "output": "$$ROOT"}
+                    }
                 }
-            },
-            {"$sort": {"count": -1}}
+            }
         ]
+
+    pipeline = [
+        {"$match": {"is_active": True, "popularity": {"$gt": 0}}},
+        {"$sort": {"popularity": -1}},
+        {"$project": POPULAR_PROJECTION},
+        {
+            "$facet": {
+                "global": [{"$limit": POPULAR_LIMIT}],
+                "region": grouped("region"),
+                "gi_tag": grouped("gi_tag")
+            }
+        }
+    ]
+    collection = read_collection(products_collection, "products_popular")
+    result = list(collection.aggregate(pipeline, session=session, maxTimeMS=READ_MAX_TIME_MS))[0]
+    
+    popular_state["stale"] = False
+    current_weight = popularity_weight(datetime.utcnow())
+
+    def ranked(products):
+        return [
+            {**serialize_doc(product), "popularity": round(product["popularity"] / current_weight, 4)}
+            for product in products
+        ]
+
+    popular_rankings.update({
+        "global": ranked(result["global"]),
+        "region": {group["_id"]: ranked(group["products"]) for group in result["region"]},
+        "gi_tag": {group["_id"]: ranked(group["products"]) for group in result["gi_tag"]}
+    })
+    popular_state["refreshed_at"] = time.monotonic()
+
+
+@on_product_change
+def mark_popular_stale(event: Dict):
+    if event["type"] != "created":
+        popular_state["stale"] = True
+
+
+def refresh_popular_rankings_after_writes():
+    with causal_session() as session:
+        refresh_popular_rankings(session)
+
+
+def popular_rankings_due() -> bool:
+    """Rankings are rebuilt after catalogue changes, and otherwise only once
+    per POPULAR_REFRESH_INTERVAL however often counters are flushed."""
+    refreshed_at = popular_state["refreshed_at"]
+    return (
+        popular_state["stale"]
+        or refreshed_at is None
+        or time.monotonic() - refreshed_at > POPULAR_REFRESH_INTERVAL
+    )
+
+
+async def flush_popularity():
+    """Flush buffered counters and refresh rankings in a worker thread."""
+    while True:
+        await asyncio.sleep(VIEW_FLUSH_INTERVAL)
+        try:
+            await asyncio.to_thread(sync_popularity_epoch)
+            await asyncio.to_thread(view_counter.flush)
+            if popular_rankings_due():
+                await asyncio.to_thread(refresh_popular_rankings_after_writes)
+        except Exception:
+            logger.exception("Failed to flush view counters")
+
+
+@app.get("/api/products/popular")
+def get_popular_products(
+    region: Optional[str] = None,
+    gi_tag: Optional[str] = None,
+    limit: int = POPULAR_LIMIT
+):
+    """Get the most viewed and verified products, globally or per region / GI tag"""
+    try:
+        if popular_state["refreshed_at"] is None:
+            refresh_popular_rankings()
         
-        results = list(products_collection.aggregate(pipeline))
-        
-        # Serialize ObjectIds
-        for result in results:
-            for product in result.get("products", []):
-                if "_id" in product:
-                    product["_id"] = str(product["_id"])
+        if region:
+            products = popular_rankings["region"].get(region, [])
+        elif gi_tag:
+            products = popular_rankings["gi_tag"].get(gi_tag, [])
+        else:
+            products = popular_rankings["global"]
         
         return {
             "success": True,
-            "gi_tags": results
+            "products": products[:max(0, limit)]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/products/verify")
-async def verify_product_by_barcode(barcode: Optional[str] = None):
-    """Verify a product by barcode or verification code. Returns product if found."""
-    if not barcode or not barcode.strip():
-        raise HTTPException(status_code=400, detail="Barcode or verification code is required")
-    code = barcode.strip().upper()
-    if not code.startswith("HC-"):
-        code = "HC-" + code
+def fetch_products_by_ids(ids: List[str]) -> Dict:
+    """Fetch active product summaries for many ids in one $in query, in input order."""
+    # Normalise valid ids to the canonical lowercase hex form so "ABC..." and
+    # "abc..." share one cache entry and match the ids in the response
+    ids = [i.strip() for i in ids if i and i.strip()]
+    ids = list(dict.fromkeys(str(ObjectId(i)) if ObjectId.is_valid(i) else i for i in ids))
+    if not ids:
+        raise HTTPException(status_code=400, detail="At least one product ID is required")
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} product IDs can be requested at once")
+
+    invalid = [i for i in ids if not ObjectId.is_valid(i)]
+    valid = [i for i in ids if ObjectId.is_valid(i)]
+
+    found = {}
+    uncached = []
+    for product_id in valid:
+        product = product_cache.get(product_id)
+        if product is None:
+            uncached.append(ObjectId(product_id))
+        else:
+            found[product_id] = product
+
+    if uncached:
+        cursor = read_collection(products_collection, "product_batch").find(
+            {"_id": {"$in": uncached}, "is_active": True},
+            PRODUCT_SUMMARY_PROJECTION
+        )
+        for product in cursor:
+            product = serialize_doc(product)
+            product_cache.set(product["_id"], product)
+            found[product["_id"]] = product
+
+    return {
+        "success": True,
+        "products": [found[i] for i in valid if i in found],
+        "missing": [i for i in valid if i not in found],
+        "invalid": invalid
+    }
+
+
+@app.get("/api/products/batch")
+def get_products_batch(ids: Optional[str] = None):
+    """Get many products by comma-separated IDs in one round trip"""
     try:
-        product = products_collection.find_one({"barcode": code, "is_active": True})
-        if not product:
-            product = products_collection.find_one({"barcode": barcode.strip(), "is_active": True})
-        if not product:
-            raise HTTPException(status_code=404, detail="Product not found. This barcode may be invalid or the product may be inactive.")
-        return {
-            "success": True,
-            "verified": True,
-            "product": serialize_doc(product)
-        }
+        return fetch_products_by_ids((ids or "").split(","))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/products/batch")
+def post_products_batch(request: ProductBatchRequest):
+    """Get many products by IDs in the request body (for lists too long for a URL)"""
+    try:
+        return fetch_products_by_ids(request.ids)
     except HTTPException:
         raise
     except Exception as e:
@@ -327,17 +1782,20 @@ async def verify_product_by_barcode(barcode: Optional[str] = None):
 
 
 @app.get("/api/products/{product_id}")
-async def get_product(product_id: str):
+def get_product(product_id: str):
     """Get a single product by ID"""
     try:
         if not ObjectId.is_valid(product_id):
             raise HTTPException(status_code=400, detail="Invalid product ID")
         
-        product = products_collection.find_one({"_id": ObjectId(product_id)})
+        product = read_collection(products_collection, "product_detail").find_one(
+            {"_id": ObjectId(product_id), "is_active": True}
+        )
         
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
         
+        view_counter.record(product["_id"], "views")
         return {
             "success": True,
             "product": serialize_doc(product)
@@ -348,157 +1806,723 @@ async def get_product(product_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/regions")
-async def get_regions():
-    """Get all unique regions with product counts"""
-    try:
-        pipeline = [
-            {"$match": {"is_active": True}},
-            {
-                "$group": {
-                    "_id": "$region",
-                    "count": {"$sum": 1},
-                    "gi_tags": {"$addToSet": "$gi_tag"},
-                    "avg_latitude": {"$avg": "$location.latitude"},
-                    "avg_longitude": {"$avg": "$location.longitude"}
-                }
-            },
+def as_naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def apply_product_change(product_id: str, expected_updated_at: datetime, changes: Dict) -> Dict:
+    """Apply `changes` to an active product if it is still at `expected_updated_at`.
+
+    Returns the document as it was before the change. Raises 404 for unknown or
+    inactive products and 409 when another write got there first.
+    """
+    if not ObjectId.is_valid(product_id):
+        raise HTTPException(status_code=400, detail="Invalid product ID")
+    
+    with causal_session() as session:
+        before = products_collection.find_one_and_update(
             {
-                "$project": {
-                    "region": "$_id",
-                    "count": 1,
-                    "gi_tags": 1,
-                    "location": {
-                        "latitude": "$avg_latitude",
-                        "longitude": "$avg_longitude"
-                    },
-                    "_id": 0
-                }
+                "_id": ObjectId(product_id),
+                "is_active": True,
+                "updated_at": as_naive_utc(expected_updated_at)
             },
-            {"$sort": {"count": -1}}
-        ]
+            {"$set": changes},
+            return_document=ReturnDocument.BEFORE,
+            session=session
+        )
+    if before:
+        return before
+    
+    current = products_collection.find_one({"_id": ObjectId(product_id)}, {"is_active": 1, "updated_at": 1})
+    if not current or not current.get("is_active"):
+        raise HTTPException(status_code=404, detail="Product not found")
+    raise HTTPException(
+        status_code=409,
+        detail={
+            "message": "Product was modified by another request; reload and retry",
+            "updated_at": current.get("updated_at").isoformat() if current.get("updated_at") else None
+        }
+    )
+
+
+@app.patch("/api/products/{product_id}")
+def update_product(product_id: str, update: ProductUpdate):
+    """Update product fields with optimistic concurrency on updated_at"""
+    try:
+        changes = update.model_dump(exclude_unset=True)
+        expected_updated_at = changes.pop("expected_updated_at")
+        
+        latitude = changes.pop("latitude", None)
+        longitude = changes.pop("longitude", None)
+        if (latitude is None) != (longitude is None):
+            raise HTTPException(status_code=400, detail="Latitude and longitude must be updated together")
+        if latitude is not None:
+            changes["location"] = {"latitude": latitude, "longitude": longitude}
         
-        regions = list(products_collection.aggregate(pipeline))
+        for field in ["name", "description", "gi_tag", "region", "artisan_name"]:
+            if field in changes and not (changes[field] or "").strip():
+                raise HTTPException(status_code=400, detail=f"{field} cannot be empty")
+        if not changes:
+            raise HTTPException(status_code=400, detail="No fields to update")
+        
+        changes["updated_at"] = utc_now()
+        before = apply_product_change(product_id, expected_updated_at, changes)
+        after = {**before, **changes}
+        if "artisan_name" in changes:
+            # Resolved only after the conditional update succeeded, so a 409
+            # or 404 never creates or modifies an artisan
+            artisan_id = get_or_create_artisan(changes["artisan_name"], changes.get("artisan_contact"))
+            with causal_session() as session:
+                products_collection.update_one(
+                    {"_id": before["_id"], "updated_at": changes["updated_at"]},
+                    {"$set": {"artisan_id": artisan_id}},
+                    session=session
+                )
+            after["artisan_id"] = artisan_id
+        emit_product_change("updated", before, after)
         
         return {
             "success": True,
-            "regions": regions
+            "message": "Product updated successfully",
+            "product": serialize_doc(dict(after))
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/gi-tags")
-async def get_gi_tags():
-    """Get all unique GI tags with product counts"""
+@app.post("/api/products/{product_id}/deactivate")
+def deactivate_product(product_id: str, request: ProductDeactivate):
+    """Deactivate (soft-delete) a product with optimistic concurrency on updated_at"""
     try:
-        pipeline = [
-            {"$match": {"is_active": True}},
-            {
-                "$group": {
-                    "_id": "$gi_tag",
-                    "count": {"$sum": 1},
-                    "regions": {"$addToSet": "$region"}
-                }
-            },
-            {
-                "$project": {
-                    "gi_tag": "$_id",
-                    "count": 1,
-                    "regions": 1,
-                    "_id": 0
-                }
-            },
-            {"$sort": {"count": -1}}
-        ]
+        changes = {"is_active": False, "updated_at": utc_now()}
+        before = apply_product_change(product_id, request.expected_updated_at, changes)
+        after = {**before, **changes}
+        emit_product_change("deactivated", before, after)
         
-        gi_tags = list(products_collection.aggregate(pipeline))
+        return {
+            "success": True,
+            "message": "Product deactivated successfully",
+            "product": serialize_doc(dict(after))
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/products/{product_id}/related")
+def get_related_products(product_id: str, limit: int = RELATED_TOP_K):
+    """Get precomputed similar products (shared GI tag, region, category, location, story)"""
+    try:
+        if not ObjectId.is_valid(product_id):
+            raise HTTPException(status_code=400, detail="Invalid product ID")
+        
+        doc = related_collection.find_one({"_id": ObjectId(product_id)})
+        if doc:
+            related = doc.get("related", [])
+        else:
+            # Not ranked yet; the background sync stores its list
+            product = products_collection.find_one(
+                {"_id": ObjectId(product_id), "is_active": True},
+                RELATED_SOURCE_PROJECTION
+            )
+            if not product:
+                raise HTTPException(status_code=404, detail="Product not found")
+            related = preview_related_products(product)
         
         return {
             "success": True,
-            "gi_tags": gi_tags
+            "product_id": product_id,
+            "related": related[:max(0, limit)]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/products/related/rebuild")
+def rebuild_related():
+    """Recompute the related-products index for the whole catalogue"""
+    try:
+        total = rebuild_related_products()
+        return {
+            "success": True,
+            "message": "Related products rebuilt",
+            "products": total
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def build_regions_payload(session=None) -> Dict:
+    """All unique regions with product counts"""
+    pipeline = [
+        {"$match": {"is_active": True}},
+        {
+            "$group": {
+                "_id": "$region",
+                "count": {"$sum": 1},
+                "gi_tags": {"$addToSet": "$gi_tag"},
+                "avg_latitude": {"$avg": "$location.latitude"},
+                "avg_longitude": {"$avg": "$location.longitude"}
+            }
+        },
+        {
+            "$project": {
+                "region": "$_id",
+                "count": 1,
+                "gi_tags": 1,
+                "location": {
+                    "latitude": "$avg_latitude",
+                    "longitude": "$avg_longitude"
+                },
+                "_id": 0
+            }
+        },
+        {"$sort": {"count": -1}}
+    ]
+
+    collection = read_collection(products_collection, "regions")
+    regions = list(collection.aggregate(pipeline, session=session, maxTimeMS=READ_MAX_TIME_MS))
+
+    return {
+        "success": True,
+        "regions": regions
+    }
+
+
+@app.get("/api/regions")
+def get_regions(request: Request):
+    """Get all unique regions with product counts"""
+    try:
+        return snapshot_response(request, "regions") or build_regions_payload()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def build_gi_tags_payload(session=None) -> Dict:
+    """All unique GI tags with product counts"""
+    pipeline = [
+        {"$match": {"is_active": True}},
+        {
+            "$group": {
+                "_id": "$gi_tag",
+                "count": {"$sum": 1},
+                "regions": {"$addToSet": "$region"}
+            }
+        },
+        {
+            "$project": {
+                "gi_tag": "$_id",
+                "count": 1,
+                "regions": 1,
+                "_id": 0
+            }
+        },
+        {"$sort": {"count": -1}}
+    ]
+
+    collection = read_collection(products_collection, "gi_tags")
+    gi_tags = list(collection.aggregate(pipeline, session=session, maxTimeMS=READ_MAX_TIME_MS))
+
+    return {
+        "success": True,
+        "gi_tags": gi_tags
+    }
+
+
+@app.get("/api/gi-tags")
+def get_gi_tags(request: Request):
+    """Get all unique GI tags with product counts"""
+    try:
+        return snapshot_response(request, "gi_tags") or build_gi_tags_payload()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def build_statistics_payload(session=None) -> Dict:
+    """Platform statistics"""
+    pipeline = [
+        {
+            "$facet": {
+                "total_products": [
+                    {"$match": {"is_active": True}},
+                    {"$count": "count"}
+                ],
+                "by_region": [
+                    {"$match": {"is_active": True}},
+                    {
+                        "$group": {
+                            "_id": "$region",
+                            "count": {"$sum": 1}
+                        }
+                    },
+                    {"$sort": {"count": -1}},
+                    {"$limit": 10}
+                ],
+                "by_gi_tag": [
+                    {"$match": {"is_active": True}},
+                    {
+                        "$group": {
+                            "_id": "$gi_tag",
+                            "count": {"$sum": 1}
+                        }
+                    },
+                    {"$sort": {"count": -1}},
+                    {"$limit": 10}
+                ]
+            }
+        }
+    ]
+
+    results = list(read_collection(products_collection, "stats").aggregate(
+        pipeline, session=session, maxTimeMS=READ_MAX_TIME_MS
+    ))
+    # Per-artisan counters are maintained on write, so this is an index count
+    unique_artisans = read_collection(artisans_collection, "stats").count_documents(
+        {"product_count": {"$gt": 0}},
+        session=session,
+        maxTimeMS=READ_MAX_TIME_MS
+    )
+
+    if results:
+        stats = results[0]
+        return {
+            "success": True,
+            "statistics": {
+                "total_products": stats["total_products"][0]["count"] if stats["total_products"] else 0,
+                "unique_regions": len(stats["by_region"]),
+                "unique_gi_tags": len(stats["by_gi_tag"]),
+                "unique_artisans": unique_artisans,
+                "top_regions": stats["by_region"],
+                "top_gi_tags": stats["by_gi_tag"]
+            }
+        }
+    else:
+        return {
+            "success": True,
+            "statistics": {
+                "total_products": 0,
+                "unique_regions": 0,
+                "unique_gi_tags": 0,
+                "unique_artisans": unique_artisans,
+                "top_regions": [],
+                "top_gi_tags": []
+            }
+        }
+
+
 @app.get("/api/stats")
-async def get_statistics():
+def get_statistics(request: Request):
     """Get platform statistics"""
     try:
-        pipeline = [
-            {
-                "$facet": {
-                    "total_products": [
-                        {"$match": {"is_active": True}},
-                        {"$count": "count"}
-                    ],
-                    "by_region": [
-                        {"$match": {"is_active": True}},
-                        {
-                            "$group": {
-                                "_id": "$region",
-                                "count": {"$sum": 1}
-                            }
-                        },
-                        {"$sort": {"count": -1}},
-                        {"$limit": 10}
-                    ],
-                    "by_gi_tag": [
-                        {"$match": {"is_active": True}},
-                        {
-                            "$group": {
-                                "_id": "$gi_tag",
-                                "count": {"$sum": 1}
-                            }
-                        },
-                        {"$sort": {"count": -1}},
-                        {"$limit": 10}
-                    ],
-                    "unique_artisans": [
-                        {"$match": {"is_active": True}},
-                        {
-                            "$group": {
-                                "_id": "$artisan_name"
-                            }
-                        },
-                        {"$count": "count"}
-                    ]
-                }
+        return snapshot_response(request, "stats") or build_statistics_payload()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+
+# Artisans
+# Artisans are stored once, keyed by a normalized name, and linked from
+# products by `artisan_id`. Per-artisan counters (product count, regions, GI
+# tags, price range) are maintained on every product write so listings and
+# statistics never have to group over the products collection.
+def artisan_name_key(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+def get_or_create_artisan(name: str, contact: Optional[str] = None) -> ObjectId:
+    """Return the id of the artisan with this name, creating it if needed."""
+    key = artisan_name_key(name)
+    now = utc_now()
+    for _ in range(2):
+        try:
+            artisan = artisans_collection.find_one_and_update(
+                {"name_key": key},
+                {
+                    "$setOnInsert": {
+                        "name": " ".join(name.split()),
+                        "name_key": key,
+                        "product_count": 0,
+                        "regions": [],
+                        "gi_tags": [],
+                        "created_at": now,
+                        "updated_at": now
+                    }
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+                projection={"_id": 1, "contact": 1}
+            )
+            break
+        except DuplicateKeyError:
+            # A concurrent upsert inserted the same name first; retry finds it
+            continue
+    else:
+        # Both attempts lost a race, so the artisan exists by now
+        artisan = artisans_collection.find_one({"name_key": key}, {"_id": 1, "contact": 1})
+    if contact and not artisan.get("contact"):
+        artisans_collection.update_one({"_id": artisan["_id"]}, {"$set": {"contact": contact}})
+    return artisan["_id"]
+
+
+def refresh_artisan_counters(artisan_id: ObjectId):
+    """Recompute one artisan's counters from its active products (indexed on artisan_id)."""
+    result = list(products_collection.aggregate([
+        {"$match": {"artisan_id": artisan_id, "is_active": True}},
+        {
+            "$group": {
+                "_id": None,
+                "product_count": {"$sum": 1},
+                "regions": {"$addToSet": "$region"},
+                "gi_tags": {"$addToSet": "$gi_tag"},
+                "price_min": {"$min": "$price"},
+                "price_max": {"$max": "$price"}
             }
-        ]
+        }
+    ]))
+    counters = result[0] if result else {"product_count": 0, "regions": [], "gi_tags": []}
+    counters.pop("_id", None)
+    update = {"$set": {**counters, "updated_at": utc_now()}}
+    # Unset rather than store null so later $min/$max increments work
+    missing_prices = {field: "" for field in ["price_min", "price_max"] if counters.get(field) is None}
+    for field in missing_prices:
+        update["$set"].pop(field, None)
+    if missing_prices:
+        update["$unset"] = missing_prices
+    with causal_session() as session:
+        artisans_collection.update_one({"_id": artisan_id}, update, session=session)
+
+
+# Product fields the per-artisan counters are derived from
+ARTISAN_COUNTED_FIELDS = ["artisan_id", "region", "gi_tag", "price"]
+
+
+@on_product_change
+def update_artisan_counters(event: Dict):
+    after, before = event["after"], event["before"]
+    if event["type"] == "created":
+        if not after.get("artisan_id"):
+            return
+        update = {
+            "$inc": {"product_count": 1},
+            "$addToSet": {"regions": after["region"], "gi_tags": after["gi_tag"]},
+            "$set": {"updated_at": utc_now()}
+        }
+        if after.get("price") is not None:
+            update["$min"] = {"price_min": after["price"]}
+            update["$max"] = {"price_max": after["price"]}
+        with causal_session() as session:
+            artisans_collection.update_one({"_id": after["artisan_id"]}, update, session=session)
+        return
+
+    contact = after.get("artisan_contact")
+    if event["type"] == "updated" and after.get("artisan_id") and contact and contact != before.get("artisan_contact"):
+        # An edited contact replaces the one the artisan was created with
+        with causal_session() as session:
+            artisans_collection.update_one(
+                {"_id": after["artisan_id"]},
+                {"$set": {"contact": contact, "updated_at": utc_now()}},
+                session=session
+            )
+
+    if event["type"] == "updated" and all(before.get(field) == after.get(field) for field in ARTISAN_COUNTED_FIELDS):
+        return
+    # Removals can shrink sets and price ranges, so recount the affected artisans
+    for artisan_id in {before.get("artisan_id"), after.get("artisan_id")}:
+        if artisan_id:
+            refresh_artisan_counters(artisan_id)
+
+
+def link_unassigned_products() -> int:
+    """Link products created before the artisans collection existed."""
+    unassigned = products_collection.find(
+        {"artisan_id": {"$exists": False}},
+        {"artisan_name": 1, "artisan_contact": 1}
+    )
+    by_artisan = {}
+    for product in unassigned:
+        if not product.get("artisan_name"):
+            continue
+        artisan_id = get_or_create_artisan(product["artisan_name"], product.get("artisan_contact"))
+        by_artisan.setdefault(artisan_id, []).append(product["_id"])
+    
+    for artisan_id, product_ids in by_artisan.items():
+        products_collection.update_many({"_id": {"$in": product_ids}}, {"$set": {"artisan_id": artisan_id}})
+        refresh_artisan_counters(artisan_id)
+    return sum(len(product_ids) for product_ids in by_artisan.values())
+
+
+@app.get("/api/artisans")
+def get_artisans(
+    region: Optional[str] = None,
+    gi_tag: Optional[str] = None,
+    limit: int = 50,
+    skip: int = 0
+):
+    """Get artisans with active products, most prolific first"""
+    try:
+        query = {"product_count": {"$gt": 0}}
+        if region:
+            query["regions"] = region
+        if gi_tag:
+            query["gi_tags"] = gi_tag
         
-        results = list(products_collection.aggregate(pipeline))
+        collection = read_collection(artisans_collection, "artisan_list")
+        artisans = list(
+            collection.find(query, {"name_key": 0})
+            .sort([("product_count", -1), ("name", 1)])
+            .skip(skip)
+            .limit(limit)
+            .max_time_ms(READ_MAX_TIME_MS)
+        )
+        total = collection.count_documents(query, maxTimeMS=READ_MAX_TIME_MS)
         
-        if results:
-            stats = results[0]
-            return {
-                "success": True,
-                "statistics": {
-                    "total_products": stats["total_products"][0]["count"] if stats["total_products"] else 0,
-                    "unique_regions": len(stats["by_region"]),
-                    "unique_gi_tags": len(stats["by_gi_tag"]),
-                    "unique_artisans": stats["unique_artisans"][0]["count"] if stats["unique_artisans"] else 0,
-                    "top_regions": stats["by_region"],
-                    "top_gi_tags": stats["by_gi_tag"]
-                }
-            }
-        else:
-            return {
-                "success": True,
-                "statistics": {
-                    "total_products": 0,
-                    "unique_regions": 0,
-                    "unique_gi_tags": 0,
-                    "unique_artisans": 0,
-                    "top_regions": [],
-                    "top_gi_tags": []
-                }
-            }
+        return {
+            "success": True,
+            "artisans": [serialize_doc(artisan) for artisan in artisans],
+            "total": total,
+            "limit": limit,
+            "skip": skip
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/artisans/{artisan_id}")
+def get_artisan(artisan_id: str, limit: int = 50):
+    """Get an artisan with their active products"""
+    try:
+        if not ObjectId.is_valid(artisan_id):
+            raise HTTPException(status_code=400, detail="Invalid artisan ID")
+        
+        artisan = read_collection(artisans_collection, "artisan_detail").find_one(
+            {"_id": ObjectId(artisan_id)},
+            {"name_key": 0},
+            max_time_ms=READ_MAX_TIME_MS
+        )
+        if not artisan:
+            raise HTTPException(status_code=404, detail="Artisan not found")
+        
+        products = list(
+            read_collection(products_collection, "artisan_detail").find(
+                {"artisan_id": artisan["_id"], "is_active": True},
+                PRODUCT_SUMMARY_PROJECTION
+            )
+            .sort("created_at", -1)
+            .limit(limit)
+            .max_time_ms(READ_MAX_TIME_MS)
+        )
+        
+        return {
+            "success": True,
+            "artisan": serialize_doc(artisan),
+            "products": [serialize_doc(product) for product in products]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Catalogue Snapshots
+# Anonymous read-only aggregates are rendered into content-hashed,
+# pre-compressed JSON files whenever the catalogue changes. The API answers
+# from the current snapshot without touching Mongo, and the versioned files are
+# immutable, so a CDN or static file server in front of SNAPSHOT_DIR can take
+# this traffic without reaching Python at all.
+SNAPSHOTS_ENABLED = os.getenv("SNAPSHOTS_ENABLED", "true").lower() == "true"
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots"))
+SNAPSHOT_REFRESH_INTERVAL = float(os.getenv("SNAPSHOT_REFRESH_INTERVAL", "5"))
+SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", "300"))
+SNAPSHOT_CLIENT_MAX_AGE = int(os.getenv("SNAPSHOT_CLIENT_MAX_AGE", "30"))
+SNAPSHOT_KEEP_VERSIONS = 3
+SNAPSHOT_FILE_RE = re.compile(r"[a-z_]+\.[0-9a-f]{16}\.json")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# name -> (API path, payload builder)
+SNAPSHOT_ROUTES = {
+    "products_by_region": ("/api/products/by-region", build_products_by_region_payload),
+    "regions": ("/api/regions", build_regions_payload),
+    "gi_tags": ("/api/gi-tags", build_gi_tags_payload),
+    "stats": ("/api/stats", build_statistics_payload),
+}
+
+
+class SnapshotStore:
+    """Builds versioned snapshot files and keeps the current ones in memory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.paths = {path: name for name, (path, _) in SNAPSHOT_ROUTES.items()}
+        # name -> {"digest", "filename", "body", "gzip"}
+        self.current = {}
+        self.dirty = True
+        self.built_at = None
+
+    def serves(self, method: str, path: str) -> bool:
+        return method == "GET" and self.paths.get(path.rstrip("/")) in self.current
+
+    def is_expired(self) -> bool:
+        # Other workers' writes are only seen by rebuilding periodically
+        return self.built_at is None or time.monotonic() - self.built_at > SNAPSHOT_MAX_AGE
+
+    def _write(self, filename: str, data: bytes, overwrite: bool = False):
+        target = os.path.join(self.directory, filename)
+        if not overwrite and os.path.exists(target):
+            return
+        temporary = f"{target}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, target)
+
+    def build(self):
+        """Render every snapshot, write new versions and publish the manifest."""
+        os.makedirs(self.directory, exist_ok=True)
+        # Cleared first so a change during the build schedules another one
+        self.dirty = False
+        current = {}
+        # One causal session, so every snapshot reflects the latest writes
+        with causal_session() as session:
+            payloads = {name: builder(session) for name, (_, builder) in SNAPSHOT_ROUTES.items()}
+        for name, payload in payloads.items():
+            body = json.dumps(payload, default=str, sort_keys=True, separators=(",", ":")).encode()
+            digest = hashlib.sha256(body).hexdigest()[:16]
+            filename = f"{name}.{digest}.json"
+            compressed = gzip.compress(body, mtime=0)
+            self._write(filename, body)
+            self._write(filename + ".gz", compressed)
+            current[name] = {"digest": digest, "filename": filename, "body": body, "gzip": compressed}
+
+        self.current = current
+        self.built_at = time.monotonic()
+        manifest = {"generated_at": utc_now().isoformat(), "snapshots": self.manifest()}
+        self._write("manifest.json", json.dumps(manifest, indent=2).encode(), overwrite=True)
+        self._prune()
+
+    def manifest(self) -> Dict:
+        return {
+            name: {
+                "path": SNAPSHOT_ROUTES[name][0],
+                "url": f"/snapshots/{snapshot['filename']}",
+                "etag": snapshot["digest"]
+            }
+            for name, snapshot in self.current.items()
+        }
+
+    def _prune(self):
+        """Keep the newest few versions of each snapshot for in-flight clients."""
+        versions = {}
+        for filename in os.listdir(self.directory):
+            if SNAPSHOT_FILE_RE.fullmatch(filename):
+                versions.setdefault(filename.split(".")[0], []).append(filename)
+        for name, filenames in versions.items():
+            filenames.sort(key=lambda f: os.path.getmtime(os.path.join(self.directory, f)), reverse=True)
+            for filename in filenames[SNAPSHOT_KEEP_VERSIONS:]:
+                if filename == self.current.get(name, {}).get("filename"):
+                    continue
+                for stale in (filename, filename + ".gz"):
+                    try:
+                        os.remove(os.path.join(self.directory, stale))
+                    except FileNotFoundError:
+                        pass
+
+
+snapshot_store = SnapshotStore(SNAPSHOT_DIR)
+
+
+@on_product_change
+def mark_snapshots_dirty(event: Dict):
+    snapshot_store.dirty = True
+
+
+async def refresh_snapshots():
+    """Rebuild snapshots in a worker thread shortly after the catalogue changes."""
+    while True:
+        if snapshot_store.dirty or snapshot_store.is_expired():
+            try:
+                await asyncio.to_thread(snapshot_store.build)
+            except Exception:
+                logger.exception("Failed to build catalogue snapshots")
+                snapshot_store.dirty = True
+        await asyncio.sleep(SNAPSHOT_REFRESH_INTERVAL)
+
+
+def accepts_gzip(request: Request) -> bool:
+    """Whether Accept-Encoding allows gzip; `gzip;q=0` is a refusal, `*` covers it."""
+    qualities = {}
+    for coding in request.headers.get("accept-encoding", "").lower().split(","):
+        name, *params = [part.strip() for part in coding.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            qualities[name] = quality
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak If-None-Match comparison against a list of ETags or `*`."""
+    candidates = [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+    return any(tag == "*" or tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def snapshot_response(request: Request, name: str) -> Optional[Response]:
+    """Answer from the current snapshot, or None if it has not been built yet."""
+    snapshot = snapshot_store.current.get(name)
+    if not snapshot:
+        return None
+    
+    etag = f'"{snapshot["digest"]}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={SNAPSHOT_CLIENT_MAX_AGE}",
+        "Content-Location": f"/snapshots/{snapshot['filename']}",
+        "Vary": "Accept-Encoding"
+    }
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if accepts_gzip(request):
+        headers["Content-Encoding"] = "gzip"
+        return Response(snapshot["gzip"], media_type="application/json", headers=headers)
+    return Response(snapshot["body"], media_type="application/json", headers=headers)
+
+
+@app.get("/api/snapshots")
+async def get_snapshot_manifest():
+    """Current snapshot versions and their immutable URLs"""
+    return {
+        "success": True,
+        "snapshots": snapshot_store.manifest()
+    }
+
+
+@app.get("/snapshots/{filename}")
+async def get_snapshot_file(filename: str, request: Request):
+    """Serve a versioned snapshot file with immutable caching"""
+    if not SNAPSHOT_FILE_RE.fullmatch(filename):
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    
+    path = os.path.join(SNAPSHOT_DIR, filename)
+    headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if accepts_gzip(request) and os.path.exists(path + ".gz"):
+        headers["Content-Encoding"] = "gzip"
+        return FileResponse(path + ".gz", media_type="application/json", headers=headers)
+    if os.path.exists(path):
+        return FileResponse(path, media_type="application/json", headers=headers)
+    raise HTTPException(status_code=404, detail="Snapshot not found")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,48 @@
+"""Run the app against an in-memory mongomock database.
+
+pymongo.MongoClient is swapped out before `main` is imported, so no MongoDB
+server is needed. mongomock has no sessions, so causal sessions yield None.
+"""
+import os
+import sys
+from contextlib import contextmanager
+
+import mongomock
+import pymongo
+import pytest
+
+os.environ["SNAPSHOTS_ENABLED"] = "false"
+pymongo.MongoClient = mongomock.MongoClient
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+@contextmanager
+def no_session():
+    yield None
+
+
+@pytest.fixture(autouse=True)
+def database(monkeypatch):
+    monkeypatch.setattr(main, "causal_session", no_session)
+    for collection in [
+        main.products_collection,
+        main.artisans_collection,
+        main.related_collection,
+        main.meta_collection,
+    ]:
+        collection.delete_many({})
+    main.product_cache.clear()
+    main.facet_cache.clear()
+    main.view_counter.pending.clear()
+    monkeypatch.setattr(main, "popular_state", {"refreshed_at": None, "stale": True, "epoch": main.POPULARITY_EPOCH})
+    monkeypatch.setattr(main, "related_index", main.RelatedIndex())
+    monkeypatch.setattr(main, "admission", main.AdmissionController(
+        main.ADMISSION_ROUTES,
+        global_limit=main.ADMISSION_GLOBAL_LIMIT,
+        rate=main.RATE_LIMIT_PER_SECOND,
+        burst=main.RATE_LIMIT_BURST,
+        max_clients=main.RATE_LIMIT_MAX_CLIENTS,
+    ))
+    yield main
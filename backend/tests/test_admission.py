@@ -0,0 +1,179 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+from starlette.responses import Response
+
+import main
+
+client = TestClient(main.app)
+
+
+def make_budget(max_concurrent=1, max_queue=1):
+    return main.RouteBudget("test", main.PRIORITY_STANDARD, max_concurrent, max_queue, 1)
+
+
+def make_request(forwarded=None, host="10.0.0.1", method="GET", path="/"):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "method": method, "path": path, "headers": headers, "client": (host, 1234)})
+
+
+def test_acquire_admits_up_to_max_concurrent():
+    async def scenario():
+        budget = make_budget(max_concurrent=2, max_queue=0)
+        assert await budget.acquire(0.1) is None
+        assert await budget.acquire(0.1) is None
+        assert await budget.acquire(0.1) == "queue_full"
+        return budget
+
+    budget = asyncio.run(scenario())
+    assert budget.active == 2
+    assert budget.counters["admitted"] == 2
+    assert budget.counters["shed_queue_full"] == 1
+
+
+def test_release_hands_slot_to_next_waiter():
+    async def scenario():
+        budget = make_budget()
+        await budget.acquire(0.1)
+        waiter = asyncio.create_task(budget.acquire(1.0))
+        await asyncio.sleep(0)
+        assert len(budget.waiters) == 1
+        budget.release()
+        assert await waiter is None
+        return budget
+
+    budget = asyncio.run(scenario())
+    # The slot moved to the waiter without being freed in between
+    assert budget.active == 1
+    assert not budget.waiters
+    assert budget.counters["queued"] == 1
+
+
+def test_queued_request_times_out():
+    async def scenario():
+        budget = make_budget()
+        await budget.acquire(0.1)
+        reason = await budget.acquire(0.01)
+        return budget, reason
+
+    budget, reason = asyncio.run(scenario())
+    assert reason == "queue_timeout"
+    assert not budget.waiters
+    assert budget.counters["shed_queue_timeout"] == 1
+    budget.release()
+    assert budget.active == 0
+
+
+def test_release_skips_waiters_that_gave_up():
+    async def scenario():
+        budget = make_budget(max_queue=2)
+        await budget.acquire(0.1)
+        abandoned = asyncio.create_task(budget.acquire(1.0))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        await asyncio.sleep(0)
+        budget.release()
+        return budget
+
+    budget = asyncio.run(scenario())
+    assert budget.active == 0
+    assert not budget.waiters
+
+
+def test_token_bucket_limits_and_refunds():
+    admission = main.AdmissionController([], global_limit=1, rate=1.0, burst=2.0, max_clients=10)
+    assert admission.take_tokens("client", 2) == 0
+    assert admission.take_tokens("client", 1) > 0
+    admission.refund_tokens("client", 2)
+    assert admission.take_tokens("client", 2) == 0
+
+
+def test_client_key_ignores_forwarded_header_without_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(main, "TRUSTED_PROXY_HOPS", 0)
+    assert main.client_key(make_request("1.2.3.4")) == "10.0.0.1"
+
+
+def test_client_key_uses_hop_added_by_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(main, "TRUSTED_PROXY_HOPS", 1)
+    # The client can spoof the first entry but not the one the proxy appended
+    assert main.client_key(make_request("6.6.6.6, 1.2.3.4")) == "1.2.3.4"
+
+
+def test_full_queue_is_shed_with_retry_after_and_refund():
+    budget = main.admission.budgets["stats"]
+    budget.max_concurrent = budget.max_queue = 0
+
+    response = client.get("/api/stats")
+
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) >= 1
+    assert budget.counters["shed_queue_full"] == 1
+    # The shed request did not spend the client's tokens
+    tokens, _ = main.admission.buckets["testclient"]
+    assert tokens == main.admission.burst
+
+
+def test_client_over_rate_limit_gets_429(monkeypatch):
+    monkeypatch.setattr(main, "admission", main.AdmissionController(
+        main.ADMISSION_ROUTES, global_limit=64, rate=0.01, burst=5, max_clients=10
+    ))
+
+    assert client.get("/api/stats").status_code == 200
+    response = client.get("/api/stats")
+
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) > 1
+    assert main.admission.budgets["stats"].counters["rate_limited"] == 1
+
+
+def test_unbudgeted_routes_skip_admission():
+    for budget in main.admission.budgets.values():
+        budget.max_concurrent = budget.max_queue = 0
+
+    assert client.get("/health").status_code == 200
+    assert main.admission.buckets == {}
+
+
+def test_snapshot_served_routes_skip_admission(monkeypatch, tmp_path):
+    store = main.SnapshotStore(str(tmp_path))
+    store.build()
+    monkeypatch.setattr(main, "snapshot_store", store)
+    budget = main.admission.budgets["regions"]
+    budget.max_concurrent = budget.max_queue = 0
+
+    response = client.get("/api/regions")
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == f'"{store.current["regions"]["digest"]}"'
+    assert budget.counters["shed_queue_full"] == 0
+
+
+def test_priority_share_is_rechecked_after_queueing():
+    admission = main.admission
+    budget = admission.budgets["stats"]
+    budget.max_concurrent = 1
+    handled = []
+
+    async def call_next(request):
+        handled.append(request)
+        return Response()
+
+    async def scenario():
+        await budget.acquire(0.1)
+        request = make_request(path="/api/stats")
+        queued = asyncio.create_task(main.admission_control(request, call_next))
+        await asyncio.sleep(0)
+        assert len(budget.waiters) == 1
+        # Other traffic fills the aggregate share while this one waits
+        admission.global_active = admission.global_limit
+        budget.release()
+        return await queued
+
+    response = asyncio.run(scenario())
+
+    assert response.status_code == 503
+    assert handled == []
+    assert budget.active == 0
+    assert budget.counters["shed_priority"] == 1
+    assert admission.buckets["10.0.0.1"][0] == admission.burst
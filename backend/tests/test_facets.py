@@ -0,0 +1,99 @@
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+import main
+
+client = TestClient(main.app)
+
+
+def insert_products(*products):
+    main.products_collection.insert_many([
+        {"_id": ObjectId(), "name": "Product", "is_active": True, "created_at": main.utc_now(), **product}
+        for product in products
+    ])
+
+
+def test_each_facet_branch_leaves_out_its_own_filter():
+    filters = {
+        "category": {"$in": ["Textiles"]},
+        "region": {"$in": ["Odisha"]},
+        "price": {"$gte": 100},
+    }
+    branches = main.facet_pipeline_branches(filters)
+
+    assert branches["category"][0] == {"$match": {"region": filters["region"], "price": filters["price"]}}
+    assert branches["region"][0] == {"$match": {"category": filters["category"], "price": filters["price"]}}
+    assert branches["gi_tag"][0] == {"$match": filters}
+    for name in ["price", "price_range"]:
+        assert branches[name][0] == {"$match": {"category": filters["category"], "region": filters["region"]}}
+
+
+def test_branches_without_filters_start_with_their_own_stages():
+    branches = main.facet_pipeline_branches({})
+
+    assert branches["category"][0] == {"$match": {"category": {"$ne": None}}}
+    assert branches["price"][0] == {"$match": {"price": {"$gte": main.PRICE_BUCKET_BOUNDARIES[0]}}}
+
+
+def test_format_facets_labels_buckets_and_values():
+    result = {
+        "category": [{"_id": "Textiles", "count": 3}],
+        "region": [],
+        "gi_tag": [{"_id": "Pattachitra", "count": 1}],
+        "price": [{"_id": 0, "count": 2}, {"_id": 5000, "count": 1}, {"_id": "over", "count": 4}],
+        "price_range": [{"_id": None, "min": 250, "max": 90000}],
+    }
+
+    assert main.format_facets(result) == {
+        "category": [{"value": "Textiles", "count": 3}],
+        "region": [],
+        "gi_tag": [{"value": "Pattachitra", "count": 1}],
+        "price": [
+            {"min": 0, "max": 1000, "count": 2},
+            {"min": 5000, "max": 10000, "count": 1},
+            {"min": 50000, "max": None, "count": 4},
+        ],
+        "price_range": {"min": 250, "max": 90000},
+    }
+
+
+def test_format_facets_without_prices():
+    facets = main.format_facets({"category": [], "region": [], "gi_tag": [], "price": [], "price_range": []})
+
+    assert facets["price"] == []
+    assert facets["price_range"] == {"min": None, "max": None}
+
+
+def test_product_list_keeps_other_options_in_filtered_facet():
+    insert_products(
+        {"category": "Textiles", "region": "Odisha", "price": 800},
+        {"category": "Textiles", "region": "Assam", "price": 60000},
+        {"category": "Paintings", "region": "Odisha", "price": -5},
+    )
+
+    response = client.get("/api/products", params={"category": "Textiles", "facets": "true"}).json()
+
+    assert response["total"] == 2
+    assert len(response["products"]) == 2
+    assert response["facets"]["category"] == [
+        {"value": "Textiles", "count": 2},
+        {"value": "Paintings", "count": 1},
+    ]
+    assert response["facets"]["region"] == [
+        {"value": "Assam", "count": 1},
+        {"value": "Odisha", "count": 1},
+    ]
+    # The negative price is left out of the buckets instead of counting as "over"
+    assert response["facets"]["price"] == [
+        {"min": 0, "max": 1000, "count": 1},
+        {"min": 50000, "max": None, "count": 1},
+    ]
+
+
+def test_product_list_omits_facets_unless_requested():
+    insert_products({"category": "Textiles", "region": "Odisha", "price": 800})
+
+    response = client.get("/api/products").json()
+
+    assert response["total"] == 1
+    assert "facets" not in response
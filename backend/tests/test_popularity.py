@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import main
+
+
+@pytest.fixture
+def mul_updates(monkeypatch):
+    """mongomock has no $mul; apply it as the equivalent pipeline update."""
+    update_many = main.products_collection.update_many
+
+    def apply(query, update, **kwargs):
+        if "$mul" in update:
+            update = [{"$set": {field: {"$multiply": [f"${field}", factor]}}} for field, factor in update["$mul"].items()]
+        return update_many(query, update, **kwargs)
+
+    monkeypatch.setattr(main.products_collection, "update_many", apply)
+
+
+def test_popularity_weight_doubles_every_half_life():
+    epoch = datetime(2025, 1, 1)
+    later = epoch + timedelta(days=main.POPULARITY_HALF_LIFE_DAYS * 3)
+
+    assert main.popularity_weight(epoch, epoch) == 1
+    assert main.popularity_weight(later, epoch) == pytest.approx(8)
+
+
+def test_rebase_rescales_buffered_scores():
+    product_id = ObjectId()
+    main.view_counter.record(product_id, "scans")
+    before = main.view_counter.pending[product_id]["popularity"]
+    new_epoch = main.POPULARITY_EPOCH + timedelta(days=main.POPULARITY_HALF_LIFE_DAYS * 2)
+
+    main.view_counter.rebase(new_epoch)
+
+    assert main.popular_state["epoch"] == new_epoch
+    assert main.view_counter.pending[product_id]["popularity"] == pytest.approx(before / 4)
+    assert main.view_counter.pending[product_id]["scans"] == 1
+
+
+def test_rebase_to_current_epoch_is_a_no_op():
+    product_id = ObjectId()
+    main.view_counter.record(product_id, "views")
+    before = dict(main.view_counter.pending[product_id])
+
+    main.view_counter.rebase(main.POPULARITY_EPOCH)
+
+    assert main.view_counter.pending[product_id] == before
+
+
+def test_sync_moves_a_due_epoch_and_keeps_decayed_scores(mul_updates):
+    product_id = main.products_collection.insert_one({"is_active": True, "popularity": 0.0}).inserted_id
+    main.view_counter.record(product_id, "scans")
+    main.view_counter.flush()
+    stored = main.products_collection.find_one({"_id": product_id})["popularity"]
+    decayed = stored / main.popularity_weight(datetime.utcnow())
+
+    main.sync_popularity_epoch()
+
+    epoch = main.meta_collection.find_one({"_id": "popularity"})["epoch"]
+    assert main.popular_state["epoch"] == epoch
+    assert datetime.utcnow() - epoch < timedelta(minutes=1)
+    rebased = main.products_collection.find_one({"_id": product_id})["popularity"]
+    assert rebased == pytest.approx(decayed, rel=1e-3)
+    assert rebased / main.popularity_weight(datetime.utcnow()) == pytest.approx(decayed, rel=1e-3)
+
+
+def test_sync_adopts_an_epoch_moved_by_another_worker(mul_updates):
+    epoch = datetime.utcnow().replace(microsecond=0) - timedelta(days=1)
+    main.meta_collection.insert_one({"_id": "popularity", "epoch": epoch})
+    product_id = ObjectId()
+    main.view_counter.record(product_id, "views")
+
+    main.sync_popularity_epoch()
+
+    assert main.popular_state["epoch"] == epoch
+    # Buffered hits are re-expressed relative to the shared epoch
+    expected = main.popularity_weight(datetime.utcnow(), epoch)
+    assert main.view_counter.pending[product_id]["popularity"] == pytest.approx(expected, rel=1e-3)
+    assert main.meta_collection.find_one({"_id": "popularity"})["epoch"] == epoch
+
+
+def test_refresh_groups_top_products_and_decays_scores(monkeypatch):
+    weight = main.popularity_weight(datetime.utcnow())
+    first = {"_id": ObjectId(), "name": "Saree", "region": "Tamil Nadu", "gi_tag": "Kanchipuram Silk", "popularity": 4 * weight}
+    second = {"_id": ObjectId(), "name": "Mask", "region": "Assam", "gi_tag": "Majuli Masks", "popularity": 2 * weight}
+    pipelines = []
+
+    class Collection:
+        # mongomock has no $topN, so answer the aggregation directly
+        def aggregate(self, pipeline, **kwargs):
+            pipelines.append(pipeline)
+            return [{
+                "global": [dict(first), dict(second)],
+                "region": [{"_id": "Tamil Nadu", "products": [dict(first)]}, {"_id": "Assam", "products": [dict(second)]}],
+                "gi_tag": [{"_id": "Majuli Masks", "products": [dict(second)]}],
+            }]
+
+    monkeypatch.setattr(main, "read_collection", lambda collection, endpoint: Collection())
+
+    main.refresh_popular_rankings()
+
+    facet = pipelines[0][-1]["$facet"]
+    top_n = facet["region"][0]["$group"]["products"]["$topN"]
+    assert top_n == {"n": main.POPULAR_LIMIT, "sortBy": {"popularity": -1}, "output": "$$ROOT"}
+    assert facet["gi_tag"][0]["$group"]["_id"] == "$gi_tag"
+    assert [p["popularity"] for p in main.popular_rankings["global"]] == pytest.approx([4, 2], rel=1e-3)
+    assert main.popular_rankings["region"]["Assam"][0]["_id"] == str(second["_id"])
+    assert not main.popular_state["stale"]
+    assert not main.popular_rankings_due()
+
+
+def test_rankings_are_not_rebuilt_on_every_flush():
+    main.popular_state.update({"stale": False, "refreshed_at": main.time.monotonic()})
+    main.view_counter.record(ObjectId(), "views")
+
+    assert not main.popular_rankings_due()
+
+    main.mark_popular_stale({"type": "updated"})
+    assert main.popular_rankings_due()
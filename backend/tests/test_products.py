@@ -0,0 +1,216 @@
+from fastapi.testclient import TestClient
+
+import main
+
+client = TestClient(main.app)
+
+
+def create_product(**fields):
+    form = {
+        "name": "Kalamkari Wall Hanging",
+        "description": "Hand-painted cotton with natural dyes",
+        "gi_tag": "Srikalahasti Kalamkari",
+        "region": "Andhra Pradesh",
+        "artisan_name": "Lakshmi Devi",
+        "price": "2500",
+        "category": "Paintings",
+        **fields,
+    }
+    response = client.post("/api/products", data=form)
+    assert response.status_code == 200
+    return response.json()["product"]
+
+
+def test_update_applies_changes_and_moves_updated_at():
+    product = create_product()
+
+    response = client.patch(f"/api/products/{product['_id']}", json={
+        "expected_updated_at": product["updated_at"],
+        "price": 3000,
+    })
+
+    assert response.status_code == 200
+    updated = response.json()["product"]
+    assert updated["price"] == 3000
+    assert updated["updated_at"] != product["updated_at"]
+
+
+def test_update_with_stale_updated_at_returns_conflict():
+    product = create_product()
+    first = client.patch(f"/api/products/{product['_id']}", json={
+        "expected_updated_at": product["updated_at"],
+        "name": "First edit",
+    })
+    assert first.status_code == 200
+
+    response = client.patch(f"/api/products/{product['_id']}", json={
+        "expected_updated_at": product["updated_at"],
+        "name": "Second edit",
+    })
+
+    assert response.status_code == 409
+    stored = main.products_collection.find_one({"name": "First edit"})
+    assert stored is not None
+    assert response.json()["detail"]["updated_at"] == stored["updated_at"].isoformat()
+
+
+def test_update_of_deactivated_product_returns_not_found():
+    product = create_product()
+    deactivated = client.post(f"/api/products/{product['_id']}/deactivate", json={
+        "expected_updated_at": product["updated_at"],
+    })
+    assert deactivated.status_code == 200
+
+    response = client.patch(f"/api/products/{product['_id']}", json={
+        "expected_updated_at": product["updated_at"],
+        "name": "Too late",
+    })
+
+    assert response.status_code == 404
+
+
+def test_deactivated_product_detail_is_not_found_and_not_counted():
+    product = create_product()
+    client.post(f"/api/products/{product['_id']}/deactivate", json={
+        "expected_updated_at": product["updated_at"],
+    })
+
+    response = client.get(f"/api/products/{product['_id']}")
+
+    assert response.status_code == 404
+    assert main.ObjectId(product["_id"]) not in main.view_counter.pending
+
+
+def test_contact_only_update_reaches_artisan():
+    product = create_product(artisan_contact="old@example.com")
+
+    response = client.patch(f"/api/products/{product['_id']}", json={
+        "expected_updated_at": product["updated_at"],
+        "artisan_contact": "new@example.com",
+    })
+
+    assert response.status_code == 200
+    artisan = main.artisans_collection.find_one({"name_key": "lakshmi devi"})
+    assert artisan["contact"] == "new@example.com"
+
+
+def test_conflicting_update_does_not_touch_artisans():
+    product = create_product()
+    client.patch(f"/api/products/{product['_id']}", json={
+        "expected_updated_at": product["updated_at"],
+        "name": "First edit",
+    })
+
+    response = client.patch(f"/api/products/{product['_id']}", json={
+        "expected_updated_at": product["updated_at"],
+        "artisan_name": "Someone Else",
+        "artisan_contact": "else@example.com",
+    })
+
+    assert response.status_code == 409
+    assert main.artisans_collection.find_one({"name_key": "someone else"}) is None
+
+
+def test_artisan_rename_moves_product_and_counters():
+    product = create_product()
+
+    response = client.patch(f"/api/products/{product['_id']}", json={
+        "expected_updated_at": product["updated_at"],
+        "artisan_name": "Ravi Kumar",
+    })
+
+    assert response.status_code == 200
+    artisan = main.artisans_collection.find_one({"name_key": "ravi kumar"})
+    assert response.json()["product"]["artisan_id"] == str(artisan["_id"])
+    stored = main.products_collection.find_one({"_id": main.ObjectId(product["_id"])})
+    assert stored["artisan_id"] == artisan["_id"]
+    assert artisan["product_count"] == 1
+    assert main.artisans_collection.find_one({"name_key": "lakshmi devi"})["product_count"] == 0
+
+
+def test_description_edit_skips_artisan_recount(monkeypatch):
+    product = create_product()
+    recounted = []
+    monkeypatch.setattr(main, "refresh_artisan_counters", recounted.append)
+
+    client.patch(f"/api/products/{product['_id']}", json={
+        "expected_updated_at": product["updated_at"],
+        "description": "Now with a longer description",
+    })
+
+    assert recounted == []
+
+
+def test_batch_returns_products_in_request_order():
+    first, second, third = (create_product(name=name) for name in ["First", "Second", "Third"])
+
+    response = client.get("/api/products/batch", params={"ids": f"{third['_id']},{first['_id']},{second['_id']}"})
+
+    assert response.status_code == 200
+    assert [p["name"] for p in response.json()["products"]] == ["Third", "First", "Second"]
+
+
+def test_batch_reports_missing_and_invalid_ids():
+    product = create_product()
+    deactivated = create_product(name="Gone")
+    client.post(f"/api/products/{deactivated['_id']}/deactivate", json={
+        "expected_updated_at": deactivated["updated_at"],
+    })
+    unknown = str(main.ObjectId())
+
+    response = client.post("/api/products/batch", json={
+        "ids": [product["_id"], unknown, "not-an-id", deactivated["_id"], " "],
+    }).json()
+
+    assert [p["_id"] for p in response["products"]] == [product["_id"]]
+    assert response["missing"] == [unknown, deactivated["_id"]]
+    assert response["invalid"] == ["not-an-id"]
+
+
+def test_batch_normalises_uppercase_and_duplicate_ids():
+    product = create_product()
+
+    response = client.get("/api/products/batch", params={
+        "ids": f"{product['_id'].upper()}, {product['_id']},{product['_id'].upper()}",
+    }).json()
+
+    assert [p["_id"] for p in response["products"]] == [product["_id"]]
+    assert response["missing"] == []
+    assert response["invalid"] == []
+
+
+def test_batch_rejects_empty_and_oversized_requests(monkeypatch):
+    monkeypatch.setattr(main, "MAX_BATCH_IDS", 2)
+    ids = [str(main.ObjectId()) for _ in range(3)]
+
+    assert client.get("/api/products/batch", params={"ids": ", ,"}).status_code == 400
+    assert client.get("/api/products/batch", params={"ids": ",".join(ids)}).status_code == 400
+    assert client.get("/api/products/batch", params={"ids": ",".join(ids[:2] + ids[:1])}).status_code == 200
+
+
+def test_batch_mixes_cached_and_uncached_products(monkeypatch):
+    cached, uncached = create_product(name="Cached"), create_product(name="Uncached")
+    main.product_cache.clear()
+    client.get("/api/products/batch", params={"ids": cached["_id"]})
+    queried = []
+    read_collection = main.read_collection
+
+    def recording_read_collection(collection, endpoint):
+        routed = read_collection(collection, endpoint)
+        find = routed.find
+
+        def recording_find(query, *args, **kwargs):
+            queried.append(query)
+            return find(query, *args, **kwargs)
+
+        routed.find = recording_find
+        return routed
+
+    monkeypatch.setattr(main, "read_collection", recording_read_collection)
+
+    response = client.get("/api/products/batch", params={"ids": f"{uncached['_id']},{cached['_id']}"}).json()
+
+    assert [p["name"] for p in response["products"]] == ["Uncached", "Cached"]
+    # Only the uncached id went to MongoDB
+    assert queried[0]["_id"] == {"$in": [main.ObjectId(uncached["_id"])]}
+    assert main.product_cache.get(uncached["_id"])["name"] == "Uncached"
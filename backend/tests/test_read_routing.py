@@ -0,0 +1,81 @@
+from contextlib import contextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+import main
+
+
+def test_parse_read_preference_bounds_staleness():
+    preference = main.parse_read_preference(" secondaryPreferred ")
+
+    assert isinstance(preference, SecondaryPreferred)
+    assert preference.max_staleness == main.READ_MAX_STALENESS_SECONDS
+    assert isinstance(main.parse_read_preference("primary"), Primary)
+
+
+def test_parse_read_preference_rejects_unknown_mode():
+    with pytest.raises(ValueError, match="Unknown read preference"):
+        main.parse_read_preference("fastest")
+
+
+def test_load_read_preferences_uses_defaults(monkeypatch):
+    monkeypatch.delenv("READ_PREFERENCES", raising=False)
+    preferences = main.load_read_preferences()
+
+    assert set(preferences) == set(main.DEFAULT_READ_PREFERENCES)
+    assert isinstance(preferences["verify"], Primary)
+    assert isinstance(preferences["stats"], SecondaryPreferred)
+
+
+def test_load_read_preferences_applies_overrides(monkeypatch):
+    monkeypatch.setenv("READ_PREFERENCES", "stats=primary, product_list=secondaryPreferred")
+    preferences = main.load_read_preferences()
+
+    assert isinstance(preferences["stats"], Primary)
+    assert isinstance(preferences["product_list"], SecondaryPreferred)
+    assert isinstance(preferences["regions"], SecondaryPreferred)
+
+
+def test_load_read_preferences_rejects_unknown_endpoint(monkeypatch):
+    monkeypatch.setenv("READ_PREFERENCES", "reports=secondary")
+
+    with pytest.raises(ValueError, match="Unknown endpoint"):
+        main.load_read_preferences()
+
+
+def test_load_read_preferences_rejects_unknown_mode(monkeypatch):
+    monkeypatch.setenv("READ_PREFERENCES", "stats=fastest")
+
+    with pytest.raises(ValueError, match="Unknown read preference"):
+        main.load_read_preferences()
+
+
+def test_request_fallback_reads_without_causal_session(monkeypatch):
+    @contextmanager
+    def forbidden():
+        raise AssertionError("request reads must not wait on a causal session")
+        yield
+
+    monkeypatch.setattr(main, "causal_session", forbidden)
+    client = TestClient(main.app)
+
+    for path in ["/api/regions", "/api/gi-tags", "/api/stats", "/api/products/by-region", "/api/products/popular"]:
+        assert client.get(path).status_code == 200, path
+
+
+def test_snapshot_build_reads_in_one_causal_session(monkeypatch, tmp_path):
+    sessions = []
+
+    @contextmanager
+    def recording():
+        sessions.append(object())
+        yield None
+
+    monkeypatch.setattr(main, "causal_session", recording)
+    store = main.SnapshotStore(str(tmp_path))
+    store.build()
+
+    assert len(sessions) == 1
+    assert set(store.current) == set(main.SNAPSHOT_ROUTES)
@@ -0,0 +1,163 @@
+import numpy as np
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+import main
+
+
+def make_product(name, gi_tag, region, latitude, longitude, description="", category="Textiles"):
+    return {
+        "_id": ObjectId(),
+        "name": name,
+        "gi_tag": gi_tag,
+        "region": region,
+        "category": category,
+        "artisan_name": "Artisan",
+        "price": 1000.0,
+        "image_url": None,
+        "location": {"latitude": latitude, "longitude": longitude},
+        "description": description,
+        "cultural_story": None,
+        "is_active": True,
+    }
+
+
+def catalogue():
+    return [
+        make_product("Saree", "Kanchipuram Silk", "Tamil Nadu", 12.83, 79.70, "handwoven silk zari border"),
+        make_product("Dupatta", "Kanchipuram Silk", "Tamil Nadu", 12.90, 79.80, "handwoven silk zari motifs"),
+        make_product("Shawl", "Pashmina", "Kashmir", 34.08, 74.80, "handwoven wool", category="Shawls"),
+        make_product("Mask", "Majuli Masks", "Assam", 26.95, 94.17, "bamboo clay", category="Crafts"),
+    ]
+
+
+def test_score_rows_prefers_shared_attributes_and_nearby_products():
+    index = main.RelatedIndex()
+    index.load(catalogue())
+    scores = index.score_rows(np.array([0]))[0]
+
+    assert scores[0] == -np.inf
+    assert scores[1] > scores[2] > 0
+    assert scores[1] == max(scores)
+
+
+def test_score_rows_excludes_deactivated_products():
+    index = main.RelatedIndex()
+    index.load(catalogue())
+    index.deactivate(1)
+    scores = index.score_rows(np.array([0, 2]))
+
+    assert np.all(scores[:, 1] == -np.inf)
+
+
+def test_top_k_returns_positive_scores_best_first(monkeypatch):
+    monkeypatch.setattr(main, "RELATED_TOP_K", 2)
+    index = main.RelatedIndex()
+    index.load(catalogue())
+    scores = np.array([
+        [-np.inf, 0.5, 2.0, 1.0],
+        [0.0, -np.inf, 0.0, 3.0],
+    ])
+
+    assert index.top_k(scores) == [[2, 3], [3]]
+
+
+def test_sync_ranks_seeded_products():
+    products = catalogue()
+    main.products_collection.insert_many(products)
+
+    assert main.sync_related_products() == len(products)
+    stored = main.related_collection.find_one({"_id": products[0]["_id"]})
+    assert stored["related"][0]["_id"] == str(products[1]["_id"])
+    assert main.sync_related_products() == 0
+
+
+def test_new_product_only_extends_existing_rankings():
+    products = catalogue()
+    main.products_collection.insert_many(products[:2])
+    main.sync_related_products()
+    # Known to the index through a preview, but never ranked
+    unranked = products[2]
+    main.preview_related_products(unranked)
+
+    entries = main.add_related_product(products[3] | {"gi_tag": "Kanchipuram Silk", "region": "Tamil Nadu"})
+
+    assert {entry["_id"] for entry in entries} >= {str(products[0]["_id"]), str(products[1]["_id"])}
+    assert main.related_collection.find_one({"_id": unranked["_id"]}) is None
+    stored = main.related_collection.find_one({"_id": products[0]["_id"]})
+    assert str(products[3]["_id"]) in [entry["_id"] for entry in stored["related"]]
+
+
+def test_related_endpoint_scores_unranked_product_without_storing():
+    products = catalogue()
+    main.products_collection.insert_many(products[:3])
+    main.sync_related_products()
+    main.products_collection.insert_one(products[3] | {"gi_tag": "Pashmina"})
+
+    response = TestClient(main.app).get(f"/api/products/{products[3]['_id']}/related")
+
+    assert response.status_code == 200
+    assert response.json()["related"][0]["_id"] == str(products[2]["_id"])
+    assert main.related_collection.find_one({"_id": products[3]["_id"]}) is None
+
+
+def test_add_grows_buffers_by_doubling():
+    products = catalogue()
+    index = main.RelatedIndex()
+    index.load(products[:2])
+
+    index.add(products[2])
+    buffer = index.buffers["term_matrix"]
+    index.add(products[3])
+
+    assert index.capacity >= 4
+    # The second add reused the spare capacity instead of copying
+    assert index.buffers["term_matrix"] is buffer
+    assert len(index.ids) == len(index.active) == len(index.columns["gi_tag"]) == 4
+    fresh = main.RelatedIndex()
+    fresh.load(products)
+    assert np.allclose(index.score_rows(np.array([3])), fresh.score_rows(np.array([3])))
+
+
+def test_score_product_matches_an_indexed_row():
+    products = catalogue()
+    index = main.RelatedIndex()
+    index.load(products)
+    other = main.RelatedIndex()
+    other.load(products[:3])
+
+    scores = other.score_product(products[3])
+
+    assert len(other.ids) == 3
+    assert np.allclose(scores, index.score_rows(np.array([3]))[0, :3])
+
+
+def test_preview_does_not_grow_the_index():
+    products = catalogue()
+    main.products_collection.insert_many(products[:3])
+    main.sync_related_products()
+
+    entries = main.preview_related_products(products[3] | {"gi_tag": "Pashmina"})
+
+    assert entries[0]["_id"] == str(products[2]["_id"])
+    assert len(main.related_index.ids) == 3
+
+
+def test_changes_made_during_sync_load_are_replayed(monkeypatch):
+    products = catalogue()
+    main.products_collection.insert_many(products[:2])
+    main.sync_related_products()
+    load = main.load_related_index
+
+    def load_while_product_changes():
+        index = load()
+        # Committed after the load read the catalogue
+        main.products_collection.insert_one(products[2])
+        main.emit_product_change("created", None, products[2])
+        return index
+
+    monkeypatch.setattr(main, "load_related_index", load_while_product_changes)
+    main.sync_related_products()
+
+    assert str(products[2]["_id"]) in main.related_index.positions
+    assert main.related_sync_state["journal"] is None
@@ -0,0 +1,101 @@
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+import main
+
+client = TestClient(main.app)
+
+
+def make_request(**headers):
+    return Request({
+        "type": "http",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    main.products_collection.insert_one({"name": "Saree", "region": "Tamil Nadu", "gi_tag": "Kanchipuram Silk", "is_active": True})
+    store = main.SnapshotStore(str(tmp_path))
+    store.build()
+    monkeypatch.setattr(main, "snapshot_store", store)
+    monkeypatch.setattr(main, "SNAPSHOT_DIR", str(tmp_path))
+    return store
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", True),
+    ("deflate, gzip;q=0.5", True),
+    ("GZIP", True),
+    ("*", True),
+    ("", False),
+    ("identity", False),
+    ("gzip;q=0", False),
+    ("gzip; q=0.0", False),
+    ("*;q=0", False),
+    ("gzip;q=0, *", False),
+    ("gzip;q=invalid", False),
+])
+def test_accepts_gzip(header, expected):
+    assert main.accepts_gzip(make_request(accept_encoding=header)) is expected
+
+
+@pytest.mark.parametrize("header, expected", [
+    ('"abc"', True),
+    ('"x", "abc"', True),
+    ('W/"abc"', True),
+    ("*", True),
+    ('"x"', False),
+    ('"abcd"', False),
+    ("", False),
+])
+def test_etag_matches(header, expected):
+    assert main.etag_matches(make_request(if_none_match=header), '"abc"') is expected
+
+
+def test_snapshot_response_serves_gzip_with_etag(store):
+    response = client.get("/api/regions", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == f'"{store.current["regions"]["digest"]}"'
+    assert response.json()["regions"][0]["region"] == "Tamil Nadu"
+
+
+def test_snapshot_response_respects_gzip_refusal(store):
+    response = client.get("/api/regions", headers={"Accept-Encoding": "gzip;q=0"})
+
+    assert "content-encoding" not in response.headers
+    assert response.content == store.current["regions"]["body"]
+
+
+@pytest.mark.parametrize("if_none_match", ['"stale", {etag}', "*", "W/{etag}"])
+def test_snapshot_response_not_modified(store, if_none_match):
+    etag = f'"{store.current["regions"]["digest"]}"'
+
+    response = client.get("/api/regions", headers={"If-None-Match": if_none_match.format(etag=etag)})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+
+def test_snapshot_response_with_other_etag_returns_body(store):
+    response = client.get("/api/regions", headers={"If-None-Match": '"stale"'})
+
+    assert response.status_code == 200
+
+
+def test_snapshot_file_is_served_immutable(store):
+    filename = store.current["stats"]["filename"]
+
+    compressed = client.get(f"/snapshots/{filename}", headers={"Accept-Encoding": "gzip"})
+    plain = client.get(f"/snapshots/{filename}", headers={"Accept-Encoding": "identity"})
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert plain.headers["cache-control"] == main.IMMUTABLE_CACHE_CONTROL
+    assert json.loads(plain.content) == json.loads(gzip.decompress(store.current["stats"]["gzip"]))
@@ -1,11 +1,12 @@
 import React, { useEffect, useState } from 'react';
 import { useParams, Link } from 'react-router-dom';
-import { productService, Product } from '../services/api';
+import { productService, Product, RelatedProduct } from '../services/api';
 import './ProductDetail.css';
 
 const ProductDetail: React.FC = () => {
   const { id } = useParams<{ id: string }>();
   const [product, setProduct] = useState<Product | null>(null);
+  const [related, setRelated] = useState<RelatedProduct[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
@@ -23,7 +24,20 @@ const ProductDetail: React.FC = () => {
       }
     };
 
+    const fetchRelated = async () => {
+      if (!id) return;
+
+      try {
+        const response = await productService.getRelatedProducts(id, 4);
+        setRelated(response.related || []);
+      } catch (err) {
+        // Similar crafts are optional; the page works without them
+        setRelated([]);
+      }
+    };
+
     fetchProduct();
+    fetchRelated();
   }, [id]);
 
   if (loading) {
@@ -144,6 +158,35 @@ const ProductDetail: React.FC = () => {
           )}
         </div>
       </div>
+
+      {related.length > 0 && (
+        <div className="similar-crafts">
+          <h2>Similar Crafts</h2>
+          <div className="similar-crafts-grid">
+            {related.map((item) => (
+              <Link key={item._id} to={`/products/${item._id}`} className="similar-craft-card">
+                {item.image_url ? (
+                  <img
+                    src={item.image_url}
+                    alt={item.name}
+                    className="similar-craft-image"
+                    onError={(e) => {
+                      (e.target as HTMLImageElement).src = 'https://via.placeholder.com/300x200?text=No+Image';
+                    }}
+                  />
+                ) : (
+                  <div className="similar-craft-image similar-craft-placeholder">
+                    <span>No Image</span>
+                  </div>
+                )}
+                <h3>{item.name}</h3>
+                <p>📍 {item.region}</p>
+                <p>🏷️ {item.gi_tag}</p>
+              </Link>
+            ))}
+          </div>
+        </div>
+      )}
     </div>
   );
 };
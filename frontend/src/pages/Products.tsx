@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { Link, useLocation } from 'react-router-dom';
-import { productService, Product } from '../services/api';
+import { productService, Product, ProductFacets } from '../services/api';
 import './Products.css';
 
 const Products: React.FC = () => {
@@ -10,25 +10,30 @@ const Products: React.FC = () => {
   const [filters, setFilters] = useState({
     region: '',
     gi_tag: '',
+    category: '',
     artisan_name: '',
+    min_price: '',
+    max_price: '',
   });
-  const [regions, setRegions] = useState<string[]>([]);
-  const [giTags, setGITags] = useState<string[]>([]);
+  const [facets, setFacets] = useState<ProductFacets | null>(null);
   const location = useLocation();
 
   useEffect(() => {
     const fetchData = async () => {
       setLoading(true);
       try {
-        const [productsRes, regionsRes, giTagsRes] = await Promise.all([
-          productService.getProducts(filters),
-          productService.getRegions(),
-          productService.getGITags(),
-        ]);
+        const productsRes = await productService.getProducts({
+          region: filters.region || undefined,
+          gi_tag: filters.gi_tag || undefined,
+          category: filters.category || undefined,
+          artisan_name: filters.artisan_name || undefined,
+          min_price: filters.min_price ? Number(filters.min_price) : undefined,
+          max_price: filters.max_price ? Number(filters.max_price) : undefined,
+          facets: true,
+        });
 
         setProducts(productsRes.products || []);
-        setRegions(regionsRes.regions?.map((r: any) => r.region) || []);
-        setGITags(giTagsRes.gi_tags?.map((g: any) => g.gi_tag) || []);
+        setFacets(productsRes.facets || null);
         setLoading(false);
       } catch (err) {
         setError('Failed to load products');
@@ -63,9 +68,9 @@ const Products: React.FC = () => {
             onChange={(e) => handleFilterChange('region', e.target.value)}
           >
             <option value="">All Regions</option>
-            {regions.map((region) => (
-              <option key={region} value={region}>
-                {region}
+            {facets?.region.map((facet) => (
+              <option key={facet.value} value={facet.value}>
+                {facet.value} ({facet.count})
               </option>
             ))}
           </select>
@@ -78,14 +83,49 @@ const Products: React.FC = () => {
             onChange={(e) => handleFilterChange('gi_tag', e.target.value)}
           >
             <option value="">All GI Tags</option>
-            {giTags.map((tag) => (
-              <option key={tag} value={tag}>
-                {tag}
+            {facets?.gi_tag.map((facet) => (
+              <option key={facet.value} value={facet.value}>
+                {facet.value} ({facet.count})
               </option>
             ))}
           </select>
         </div>
 
+        <div className="filter-group">
+          <label>Category</label>
+          <select
+            value={filters.category}
+            onChange={(e) => handleFilterChange('category', e.target.value)}
+          >
+            <option value="">All Categories</option>
+            {facets?.category.map((facet) => (
+              <option key={facet.value} value={facet.value}>
+                {facet.value} ({facet.count})
+              </option>
+            ))}
+          </select>
+        </div>
+
+        <div className="filter-group">
+          <label>Price (₹)</label>
+          <div className="price-range">
+            <input
+              type="number"
+              min="0"
+              placeholder={facets?.price_range.min?.toString() || 'Min'}
+              value={filters.min_price}
+              onChange={(e) => handleFilterChange('min_price', e.target.value)}
+            />
+            <input
+              type="number"
+              min="0"
+              placeholder={facets?.price_range.max?.toString() || 'Max'}
+              value={filters.max_price}
+              onChange={(e) => handleFilterChange('max_price', e.target.value)}
+            />
+          </div>
+        </div>
+
         <div className="filter-group">
           <label>Artisan Name</label>
           <input
@@ -15,6 +15,7 @@ export interface Product {
   description: string;
   gi_tag: string;
   region: string;
+  artisan_id?: string;
   artisan_name: string;
   artisan_contact?: string;
   price?: number;
@@ -31,6 +32,17 @@ export interface Product {
   is_active?: boolean;
 }
 
+export interface RelatedProduct {
+  _id: string;
+  name: string;
+  gi_tag: string;
+  region: string;
+  artisan_name: string;
+  price?: number;
+  image_url?: string;
+  score: number;
+}
+
 export interface Region {
   region: string;
   count: number;
@@ -49,6 +61,17 @@ export interface GITag {
   products?: Product[];
 }
 
+export interface Artisan {
+  _id: string;
+  name: string;
+  contact?: string;
+  product_count: number;
+  regions: string[];
+  gi_tags: string[];
+  price_min?: number;
+  price_max?: number;
+}
+
 export interface Statistics {
   total_products: number;
   unique_regions: number;
@@ -58,11 +81,28 @@ export interface Statistics {
   top_gi_tags: Array<{ _id: string; count: number }>;
 }
 
+export interface FacetCount {
+  value: string;
+  count: number;
+}
+
+export interface ProductFacets {
+  category: FacetCount[];
+  region: FacetCount[];
+  gi_tag: FacetCount[];
+  price: Array<{ min: number; max: number | null; count: number }>;
+  price_range: { min?: number; max?: number };
+}
+
 export const productService = {
   getProducts: async (params?: {
     region?: string;
     gi_tag?: string;
+    category?: string;
     artisan_name?: string;
+    min_price?: number;
+    max_price?: number;
+    facets?: boolean;
     limit?: number;
     skip?: number;
   }) => {
@@ -75,6 +115,23 @@ export const productService = {
     return response.data;
   },
 
+  getPopularProducts: async (params?: { region?: string; gi_tag?: string; limit?: number }) => {
+    const response = await api.get('/api/products/popular', { params });
+    return response.data;
+  },
+
+  getProductsBatch: async (ids: string[]) => {
+    const response = await api.post('/api/products/batch', { ids });
+    return response.data;
+  },
+
+  getRelatedProducts: async (id: string, limit?: number) => {
+    const response = await api.get(`/api/products/${id}/related`, {
+      params: limit ? { limit } : undefined,
+    });
+    return response.data;
+  },
+
   verifyProduct: async (barcode: string) => {
     const response = await api.get('/api/products/verify', {
       params: { barcode: barcode.trim() },
@@ -91,6 +148,21 @@ export const productService = {
     return response.data;
   },
 
+  updateProduct: async (id: string, expectedUpdatedAt: string, changes: Partial<Product>) => {
+    const response = await api.patch(`/api/products/${id}`, {
+      ...changes,
+      expected_updated_at: expectedUpdatedAt,
+    });
+    return response.data;
+  },
+
+  deactivateProduct: async (id: string, expectedUpdatedAt: string) => {
+    const response = await api.post(`/api/products/${id}/deactivate`, {
+      expected_updated_at: expectedUpdatedAt,
+    });
+    return response.data;
+  },
+
   getProductsByRegion: async () => {
     const response = await api.get('/api/products/by-region');
     return response.data;
@@ -111,6 +183,21 @@ export const productService = {
     return response.data;
   },
 
+  getArtisans: async (params?: {
+    region?: string;
+    gi_tag?: string;
+    limit?: number;
+    skip?: number;
+  }) => {
+    const response = await api.get('/api/artisans', { params });
+    return response.data;
+  },
+
+  getArtisan: async (id: string) => {
+    const response = await api.get(`/api/artisans/${id}`);
+    return response.data;
+  },
+
   getStatistics: async () => {
     const response = await api.get('/api/stats');
     return response.data;